@@ -111,8 +111,7 @@ def process_podcast(pdf_file, config_file, format_type, length, style, language,
             generated_files = [
                 "step1/extracted_text.txt",
                 "step1/clean_extracted_text.txt",
-                "step2/data.pkl",
-                "step3/podcast_ready_data.pkl",
+                "step2/data.txt",
                 "step3/podcast_ready_data.txt"
             ]
             
@@ -121,7 +120,8 @@ def process_podcast(pdf_file, config_file, format_type, length, style, language,
                 if os.path.exists(full_path) and file.endswith(".txt"):
                     try:
                         with open(full_path, 'r', encoding='utf-8') as f:
-                            file_content = f.read()
+                            # Only the preview is read, not the whole file
+                            file_content = f.read(1001)
                             file_contents[file] = file_content[:1000] + "..." if len(file_content) > 1000 else file_content
                     except Exception as e:
                         file_contents[file] = f"Error reading file: {str(e)}"
@@ -35,7 +35,10 @@ base_config: Tuple = {
         "max_tokens": 1028,
         "temperature": 0.7,
         "chunk_size": 1000,
-        "max_chars": 100000
+        "chunk_token_limit": 800,
+        "max_chars": 100000,
+        "concurrency": 1,
+        "extraction_workers": 1
     },
 
     "Step2": {
@@ -47,6 +47,7 @@ def podcast_processor(
         # Initialize variables for file paths that might be skipped
         cleaned_text_file = None
         transcript_file = None
+        transcript = None
         
         # Extract system prompts for each step (with fallbacks to general system prompt)
         system_prompts = {}
@@ -99,7 +100,7 @@ def podcast_processor(
         else:
             # If skipping, find the most recent output file from step2
             print("Skipping Step 2, looking for existing output...")
-            step2_files = list(output_dirs["step2"].glob("*.pkl"))
+            step2_files = list(output_dirs["step2"].glob("*.jsonl"))
             if step2_files:
                 transcript_file = str(sorted(step2_files, key=lambda x: x.stat().st_mtime, reverse=True)[0])
                 print(f"Using existing file from Step 2: {transcript_file}")
@@ -111,7 +112,7 @@ def podcast_processor(
         # Step 3: Optimize for TTS
         if not skip_to or skip_to <= 3:
             print("Step 3: Optimizing for text-to-speech...")
-            step3(
+            _, _, transcript = step3(
                 client=big_text_client,
                 config=config,
                 input_file=transcript_file,
@@ -130,7 +131,8 @@ def podcast_processor(
                 client=tts_client,
                 config=config,
                 input_dir=str(output_dirs["step3"]),
-                output_dir=str(output_dirs["step4"])
+                output_dir=str(output_dirs["step4"]),
+                transcript=transcript
             )
             
             print(f"Podcast generation complete! Final audio file: {final_audio_path}")
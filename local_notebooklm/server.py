@@ -1,6 +1,7 @@
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks
 from fastapi.responses import FileResponse
 from enum import Enum
+from itertools import islice
 from typing import Optional
 import tempfile
 import os
@@ -10,6 +11,7 @@ import uuid
 
 # Import the processor
 from .processor import podcast_processor
+from .steps.transcript import iter_transcript
 
 # Create FastAPI app
 app = FastAPI(
@@ -79,8 +81,16 @@ class PodcastStatusResponse(BaseModel):
     result: Optional[dict] = None
     audio_url: Optional[str] = None
 
+class TranscriptResponse(BaseModel):
+    job_id: str
+    source: str
+    turns: list
+    next_offset: int
+
 # Dictionary to store job statuses
 job_status = {}
+# Output directory of each job, for reading its transcript
+job_output_dirs = {}
 
 # Function to process podcast in background
 def process_podcast(
@@ -157,10 +167,7 @@ def process_podcast(
             if os.path.exists(segments_dir):
                 shutil.rmtree(segments_dir)
                 
-            # Remove data pkl file
-            data_file = os.path.join(job_output_dir, "podcast_ready_data.pkl")
-            if os.path.exists(data_file):
-                os.remove(data_file)
+            # podcast_ready_data.jsonl is kept so /transcript/{job_id} still works
                 
             # Don't remove podcast.wav here as we've already copied it
     except Exception as e:
@@ -202,6 +209,7 @@ async def generate_podcast(
     
     # Update job status
     job_status[job_id] = {"status": "processing"}
+    job_output_dirs[job_id] = output_dir
     
     # Add the task to background tasks
     background_tasks.add_task(
@@ -275,6 +283,20 @@ async def download_podcast(job_id: str, background_tasks: BackgroundTasks):
         media_type="audio/wav"
     )
 
+@app.get("/transcript/{job_id}", response_model=TranscriptResponse)
+async def get_transcript(job_id: str, offset: int = 0, limit: int = 100):
+    if job_id not in job_output_dirs:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    # Prefer the TTS-ready transcript; fall back to step2's while step3 has not written one yet
+    for source in ("step3/podcast_ready_data.jsonl", "step2/data.jsonl"):
+        path = os.path.join(job_output_dirs[job_id], source)
+        if os.path.exists(path):
+            turns = list(islice(iter_transcript(path), offset, offset + limit))
+            return TranscriptResponse(job_id=job_id, source=source, turns=turns, next_offset=offset + len(turns))
+
+    raise HTTPException(status_code=404, detail="Transcript not available yet")
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -290,6 +312,7 @@ async def root():
             {"path": "/generate-podcast/", "method": "POST", "description": "Generate a podcast from PDF"},
             {"path": "/job-status/{job_id}", "method": "GET", "description": "Check status of a job"},
             {"path": "/download-podcast/{job_id}", "method": "GET", "description": "Download the generated podcast audio file"},
+            {"path": "/transcript/{job_id}", "method": "GET", "description": "Read transcript turns page by page (offset, limit)"},
             {"path": "/health", "method": "GET", "description": "API health check"}
         ]
     }
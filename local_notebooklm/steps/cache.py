@@ -0,0 +1,300 @@
+from typing import Any, List, Optional
+from pathlib import Path
+import hashlib, json, logging, os, sqlite3, threading, time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+class ChunkCache:
+    """Persistent content-addressed cache of cleaned chunks with size-bounded LRU eviction."""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        cache_dir = Path(cache_dir).expanduser()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = cache_dir / "chunks.sqlite"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_last_access ON chunks(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(**fields: Any) -> str:
+        payload = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM chunks WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE chunks SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM chunks").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM chunks ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM chunks WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ChunkCheckpoint:
+    """Per-chunk checkpoint manifest for resumable step1 runs.
+
+    Cleaned chunks are appended to a parts file, and the manifest records each
+    chunk index with its hash and the byte offset and length of its output. A
+    manifest line is only written after its data is flushed. A crashed run
+    therefore resumes from every chunk that finished, in any order. Other runs
+    appending to the same files are picked up on lookup, so concurrent runs can
+    fill gaps in any order.
+
+    Lookups go by hash, so an output whose input moved to another index (for
+    example after pages were added to a revised PDF) is reused too. When
+    `provenance` is set, each entry also records the source pages of its index.
+    The same store keeps extracted page text keyed by page content hash.
+
+    `compact` drops everything the current run did not use, so the files do not
+    keep growing when an output directory is reused for other documents.
+
+    Reads and writes hold a lock on a separate `.lock` file, which is never
+    replaced and stores a generation number that `compact` bumps. On lookup, a
+    run whose generation is stale reloads the manifest from the start. Every
+    open checkpoint also holds a shared lock on an `.active` file, and `compact`
+    is skipped while another run holds it.
+    """
+
+    def __init__(self, output_file: str, provenance: Optional[List[List[int]]] = None):
+        output_file = Path(output_file)
+        self.parts_path = output_file.with_suffix(".parts")
+        self.manifest_path = output_file.with_suffix(".manifest.jsonl")
+        self.lock_path = output_file.with_suffix(".lock")
+        self.active_path = output_file.with_suffix(".active")
+        self.provenance = provenance
+        self.entries = {}
+        self.by_hash = {}
+        self._used = {}
+        self._manifest_pos = 0
+        self._generation = None
+        self._lock = threading.Lock()
+        self.parts_path.touch(exist_ok=True)
+        self.manifest_path.touch(exist_ok=True)
+        self._lock_handle = open(self.lock_path, "a+b")
+        self._active_handle = open(self.active_path, "a+b")
+        _lock_file(self._active_handle, shared=True)
+        with self._lock:
+            _lock_file(self._lock_handle, shared=True)
+            try:
+                self._refresh()
+            finally:
+                _unlock_file(self._lock_handle)
+
+    def _read_generation(self) -> int:
+        self._lock_handle.seek(0)
+        raw = self._lock_handle.read().strip()
+        return int(raw) if raw.isdigit() else 0
+
+    def _refresh(self):
+        # Callers hold the lock file, so the parts file and manifest are not being replaced.
+        generation = self._read_generation()
+        if generation != self._generation:
+            # Another run compacted the files; offsets read so far point into the old parts file.
+            self.entries = {}
+            self.by_hash = {}
+            self._manifest_pos = 0
+            self._generation = generation
+        with open(self.manifest_path, "rb") as manifest:
+            manifest.seek(self._manifest_pos)
+            for line in manifest:
+                if not line.endswith(b"\n"):
+                    break
+                self._manifest_pos += len(line)
+                try:
+                    entry = json.loads(line.decode("utf-8"))
+                except json.JSONDecodeError:
+                    continue
+                self._add(entry)
+
+    def _add(self, entry: dict):
+        self.entries[entry["index"]] = entry
+        self.by_hash[entry["hash"]] = entry
+
+    def _read(self, entry: dict) -> str:
+        with open(self.parts_path, "rb") as parts:
+            parts.seek(entry["offset"])
+            return parts.read(entry["length"]).decode("utf-8")
+
+    def get(self, index: int, chunk_hash: str) -> Optional[str]:
+        with self._lock:
+            _lock_file(self._lock_handle, shared=True)
+            try:
+                self._refresh()
+                entry = self.by_hash.get(chunk_hash)
+                if entry is None:
+                    return None
+                self._used[index] = chunk_hash
+                return self._read(entry)
+            finally:
+                _unlock_file(self._lock_handle)
+
+    def hash_at(self, index: int) -> Optional[str]:
+        entry = self.entries.get(index)
+        return entry["hash"] if entry is not None else None
+
+    def record(self, index: int, chunk_hash: str, output: str, **extra: Any):
+        data = output.encode("utf-8")
+        with self._lock:
+            self._used[index] = chunk_hash
+            _lock_file(self._lock_handle)
+            try:
+                # Open only once the lock is held, so a compaction cannot swap the files underneath.
+                with open(self.parts_path, "ab") as parts, open(self.manifest_path, "a", encoding="utf-8") as manifest:
+                    self._refresh()
+                    entry = self.entries.get(index)
+                    if entry is not None and entry["hash"] == chunk_hash:
+                        return
+                    existing = self.by_hash.get(chunk_hash)
+                    if existing is not None:
+                        # Same output already stored under another index; only re-point this index.
+                        offset, length = existing["offset"], existing["length"]
+                    else:
+                        parts.seek(0, 2)
+                        offset = parts.tell()
+                        parts.write(data)
+                        parts.flush()
+                        length = len(data)
+                    entry = {"index": index, "hash": chunk_hash, "offset": offset, "length": length, **extra}
+                    if self.provenance is not None and index < len(self.provenance):
+                        entry["pages"] = self.provenance[index]
+                    manifest.write(json.dumps(entry) + "\n")
+                    manifest.flush()
+                    self._add(entry)
+            finally:
+                _unlock_file(self._lock_handle)
+
+    def completed(self) -> int:
+        return len(self.entries)
+
+    def compact(self):
+        """Rewrite the parts file and manifest with only the entries this run looked up or recorded.
+
+        Skipped while another run has the checkpoint open, since it may still need the entries
+        this run would drop.
+        """
+        with self._lock:
+            if not _try_lock_file(self._active_handle):
+                logger.info(f"Not compacting {self.manifest_path.name}: another run is using it")
+                return
+            try:
+                _lock_file(self._lock_handle)
+                try:
+                    self._refresh()
+                    data = bytearray()
+                    stored = {}
+                    entries = []
+                    with open(self.parts_path, "rb") as parts:
+                        for index, chunk_hash in sorted(self._used.items()):
+                            entry = self.by_hash.get(chunk_hash)
+                            if entry is None:
+                                continue
+                            if chunk_hash not in stored:
+                                parts.seek(entry["offset"])
+                                blob = parts.read(entry["length"])
+                                stored[chunk_hash] = (len(data), len(blob))
+                                data += blob
+                            offset, length = stored[chunk_hash]
+                            entry = {**entry, "index": index, "offset": offset, "length": length}
+                            entry.pop("pages", None)
+                            if self.provenance is not None and index < len(self.provenance):
+                                entry["pages"] = self.provenance[index]
+                            entries.append(entry)
+
+                    manifest_data = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+                    parts_tmp = self.parts_path.with_name(self.parts_path.name + ".tmp")
+                    manifest_tmp = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+                    parts_tmp.write_bytes(bytes(data))
+                    manifest_tmp.write_bytes(manifest_data)
+                    # Empty the manifest first: if we stop before the end, the checkpoint is
+                    # empty rather than pointing into the wrong parts file.
+                    with open(self.manifest_path, "wb"):
+                        pass
+                    os.replace(parts_tmp, self.parts_path)
+                    os.replace(manifest_tmp, self.manifest_path)
+                    generation = self._read_generation() + 1
+                    self._lock_handle.seek(0)
+                    self._lock_handle.truncate()
+                    self._lock_handle.write(str(generation).encode("ascii"))
+                    self._lock_handle.flush()
+                finally:
+                    _unlock_file(self._lock_handle)
+            finally:
+                _lock_file(self._active_handle, shared=True)
+
+            removed = len(self.entries) - len(entries)
+            self.entries = {}
+            self.by_hash = {}
+            for entry in entries:
+                self._add(entry)
+            self._manifest_pos = len(manifest_data)
+            self._generation = generation
+            logger.info(f"Compacted {self.manifest_path.name}: kept {len(entries)} entries, dropped {max(0, removed)}")
+
+    def close(self):
+        with self._lock:
+            if self._lock_handle.closed:
+                return
+            self._lock_handle.close()
+            self._active_handle.close()
+
+def _lock_file(file, shared: bool = False):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+def _try_lock_file(file) -> bool:
+    """Take an exclusive lock without waiting; False if another handle holds the file."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+def _unlock_file(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
@@ -1,11 +1,25 @@
-from typing import Dict, Any, List, Optional, Literal
+from typing import Dict, Any, Iterator, List, Optional, Literal, Callable
 from elevenlabs.client import ElevenLabs
 from openai import OpenAI, AzureOpenAI
 from anthropic import Anthropic
 from elevenlabs import save
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
 from google import genai
-import time
+import json, logging, re, threading, time
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:
+    from transformers import AutoTokenizer
+except ImportError:
+    AutoTokenizer = None
+
+
+logger = logging.getLogger(__name__)
 
 FormatType = Literal[
     "podcast", "interview", "panel-discussion", "debate",
@@ -65,8 +79,332 @@ StyleType = Literal["normal", "friendly", "professional", "academic", "casual",
 
 SkipToOptions = [None, 1, 2, 3, 4]
 
-def wait_for_next_step(seconds: float = 2):
-    time.sleep(seconds)
+class _TokenBucket:
+    """Holds up to one minute of budget and refills continuously at `per_minute`."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def delay(self, amount: float, now: float) -> float:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Per-provider token-bucket rate limiter, shared across threads.
+
+    `requests_per_minute` and `tokens_per_minute` each feed a bucket holding one
+    minute of budget, so a call only waits once a limit is actually reached; with
+    neither set, calls never wait. When the provider answers 429, every caller
+    pauses for the Retry-After delay (or an exponential backoff) and the call is retried.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = 5,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0
+    ):
+        self.requests = _TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.throttled = 0
+        self._backoff = initial_backoff
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 0):
+        """Block until one request using `tokens` tokens fits in the budget."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._paused_until - now
+                if delay <= 0:
+                    delay = max(
+                        self.requests.delay(1, now) if self.requests else 0.0,
+                        self.tokens.delay(tokens, now) if self.tokens and tokens else 0.0
+                    )
+                    if delay <= 0:
+                        if self.requests:
+                            self.requests.take(1)
+                        if self.tokens and tokens:
+                            self.tokens.take(tokens)
+                        return
+            time.sleep(delay)
+
+    def wait(self):
+        self.acquire()
+
+    def backoff(self, retry_after: Optional[float] = None) -> float:
+        """Pause all callers after a 429, for `retry_after` seconds or the next exponential step."""
+        with self._lock:
+            if retry_after is None:
+                retry_after = self._backoff
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            return retry_after
+
+    def call(self, fn: Callable[[], Any], tokens: float = 0) -> Any:
+        """Run `fn` within the budget, retrying it after rate-limit errors."""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                if attempt == self.max_retries or not is_rate_limit_error(e):
+                    raise
+                delay = self.backoff(retry_after_seconds(e))
+                logger.warning(f"Rate limited by provider, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                continue
+            with self._lock:
+                self._backoff = self.initial_backoff
+            return result
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    for attr in ("status_code", "code", "status"):
+        if getattr(error, attr, None) == 429:
+            return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_request_rejected_error(error: Exception) -> bool:
+    """True when the provider rejected the request itself (HTTP 400/422), e.g. an unsupported response_format or tool."""
+    for attr in ("status_code", "code", "status"):
+        if getattr(error, attr, None) in (400, 422):
+            return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in (400, 422) or type(error).__name__ in ("BadRequestError", "UnprocessableEntityError")
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After delay from a provider error, if the response carried one."""
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+_rate_limiters: Dict[tuple, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider_config: Optional[Dict[str, Any]]) -> RateLimiter:
+    """Return the shared rate limiter for a provider config.
+
+    Configs that name the same provider and endpoint share one limiter, so
+    steps that talk to the same backend draw from the same budget.
+    """
+    provider_config = provider_config or {}
+    key = (
+        provider_config.get("name"),
+        provider_config.get("endpoint"),
+        provider_config.get("requests_per_minute"),
+        provider_config.get("tokens_per_minute"),
+    )
+    with _rate_limiters_lock:
+        if key not in _rate_limiters:
+            _rate_limiters[key] = RateLimiter(
+                requests_per_minute=provider_config.get("requests_per_minute"),
+                tokens_per_minute=provider_config.get("tokens_per_minute")
+            )
+        return _rate_limiters[key]
+
+
+def estimate_tokens(text: str) -> int:
+    """Heuristic token count: ~4 ASCII characters per token, one token per non-ASCII character."""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return -(-ascii_chars // 4) + (len(text) - ascii_chars)
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model: Optional[str] = None, tokenizer: Optional[str] = None) -> Callable[[str], int]:
+    """Return a cached token counting function for a model.
+
+    `tokenizer` may name a tiktoken encoding or a Hugging Face tokenizer; otherwise the
+    model name is tried against tiktoken. Falls back to `estimate_tokens` when no
+    tokenizer can be loaded.
+    """
+    if tiktoken is not None:
+        for name in (tokenizer, model):
+            if not name:
+                continue
+            # Besides unknown names, loading can fail on the BPE file download when offline.
+            try:
+                encoding = tiktoken.get_encoding(name)
+            except Exception:
+                try:
+                    encoding = tiktoken.encoding_for_model(name)
+                except Exception as e:
+                    logger.debug(f"No tiktoken encoding for {name}: {e}")
+                    continue
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+    if AutoTokenizer is not None and tokenizer:
+        try:
+            hf_tokenizer = AutoTokenizer.from_pretrained(tokenizer)
+            return lambda text: len(hf_tokenizer.encode(text, add_special_tokens=False))
+        except Exception:
+            pass
+
+    return estimate_tokens
+
+
+def token_counter_for(model_config: Dict[str, Any]) -> Callable[[str], int]:
+    return get_token_counter(model_config.get("model"), model_config.get("tokenizer"))
+
+
+def split_by_token_budget(
+    text: str,
+    token_limit: int,
+    overlap_percent: float = 0,
+    count_tokens: Callable[[str], int] = estimate_tokens
+) -> List[str]:
+    """Split text on word boundaries into chunks of at most `token_limit` tokens, with word overlap.
+
+    Whitespace between words (including newlines) is preserved inside each chunk.
+    """
+    words = re.findall(r"\s*\S+", text)
+    word_tokens = [count_tokens(word) for word in words]
+    overlap_tokens = int(token_limit * overlap_percent / 100)
+
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = start
+        used = 0
+        while end < len(words) and (used + word_tokens[end] <= token_limit or end == start):
+            used += word_tokens[end]
+            end += 1
+        chunks.append("".join(words[start:end]).strip())
+        if end >= len(words):
+            break
+
+        # Step back over whole words to carry `overlap_tokens` into the next chunk.
+        next_start = end
+        carried = 0
+        while next_start > start + 1 and carried + word_tokens[next_start - 1] <= overlap_tokens:
+            next_start -= 1
+            carried += word_tokens[next_start]
+        start = next_start
+    return chunks
+
+
+TURN_START = re.compile(r'^\s*\**[^\W\d_][\w .\'-]{0,40}?\**\s*:')
+SENTENCE_END = re.compile(r'(?<=[.!?\u2026])\s+')
+
+
+def split_turns(text: str) -> List[str]:
+    """Split a transcript into turns: a turn starts at a `Speaker:` line or after a blank line."""
+    turns = []
+    current = []
+    for line in text.splitlines():
+        if not line.strip():
+            if current:
+                turns.append("\n".join(current))
+                current = []
+            continue
+        if current and TURN_START.match(line):
+            turns.append("\n".join(current))
+            current = []
+        current.append(line.strip())
+    if current:
+        turns.append("\n".join(current))
+    return turns
+
+
+def _split_long_turn(turn: str, token_limit: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Break a turn over the budget at sentence ends (words as a last resort), repeating its speaker label."""
+    label = TURN_START.match(turn)
+    prefix = label.group(0).strip() + " " if label else ""
+    body_limit = max(1, token_limit - count_tokens(prefix))
+    sentences = []
+    for sentence in SENTENCE_END.split(turn[label.end():].strip() if label else turn):
+        if count_tokens(sentence) > body_limit:
+            sentences.extend(split_by_token_budget(sentence, body_limit, 0, count_tokens))
+        else:
+            sentences.append(sentence)
+
+    pieces = []
+    current = []
+    used = 0
+    for sentence in sentences:
+        # Count the joining space too, so the joined piece stays within the budget
+        tokens = count_tokens(" " + sentence)
+        if current and used + tokens > body_limit:
+            pieces.append(prefix + " ".join(current))
+            current = []
+            used = 0
+        current.append(sentence)
+        used += tokens
+    if current:
+        pieces.append(prefix + " ".join(current))
+    return pieces
+
+
+def split_by_turns(
+    text: str,
+    token_limit: int,
+    overlap_turns: int = 0,
+    count_tokens: Callable[[str], int] = estimate_tokens
+) -> List[str]:
+    """Split a transcript into chunks of whole turns, each filled up to `token_limit` tokens.
+
+    Chunks only break between turns (see `split_turns`); a single turn over the
+    budget is broken at sentence ends. Each chunk after the first repeats the
+    last `overlap_turns` turns of the one before it, as far as they fit the budget.
+    """
+    turns = []
+    for turn in split_turns(text):
+        if count_tokens(turn) > token_limit:
+            turns.extend(_split_long_turn(turn, token_limit, count_tokens))
+        else:
+            turns.append(turn)
+    turn_tokens = [count_tokens(turn + "\n") for turn in turns]
+
+    chunks = []
+    start = 0
+    while start < len(turns):
+        first = max(0, start - overlap_turns) if chunks else start
+        used = sum(turn_tokens[first:start])
+        while first < start and used + turn_tokens[start] > token_limit:
+            used -= turn_tokens[first]
+            first += 1
+        end = start
+        while end < len(turns) and (used + turn_tokens[end] <= token_limit or end == start):
+            used += turn_tokens[end]
+            end += 1
+        chunks.append("\n".join(turns[first:end]))
+        start = end
+    return chunks
 
 
 def set_provider(
@@ -151,18 +489,281 @@ def set_provider(
         raise ValueError(f"Unsupported provider: {provider_name}")
 
 
+class Counters:
+    """Thread-safe integer counters named in `FIELDS`; subclasses only list their fields."""
+
+    FIELDS = ()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def add(self, **amounts: int):
+        with self._lock:
+            for field, amount in amounts.items():
+                setattr(self, field, getattr(self, field) + amount)
+
+    def record(self, field: str):
+        self.add(**{field: 1})
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class TokenUsage:
+    """Thread-safe totals of prompt tokens, and how many the provider served from its prompt cache."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.cache_write_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, prompt_tokens: int = 0, cached_tokens: int = 0, cache_write_tokens: int = 0):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            self.cache_write_tokens += cache_write_tokens
+
+    def record(self, raw_usage: Any):
+        """Add one call from a provider usage object (OpenAI, Anthropic or Gemini)."""
+        if raw_usage is None:
+            return
+        if hasattr(raw_usage, "input_tokens"):
+            cached = getattr(raw_usage, "cache_read_input_tokens", None) or 0
+            written = getattr(raw_usage, "cache_creation_input_tokens", None) or 0
+            self.add((raw_usage.input_tokens or 0) + cached + written, cached, written)
+        elif hasattr(raw_usage, "prompt_token_count"):
+            self.add(raw_usage.prompt_token_count or 0, getattr(raw_usage, "cached_content_token_count", None) or 0)
+        else:
+            details = getattr(raw_usage, "prompt_tokens_details", None)
+            self.add(getattr(raw_usage, "prompt_tokens", None) or 0, getattr(details, "cached_tokens", None) or 0)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+        }
+
+
+def _cacheable_system(system_message: str, cache_prompt: bool):
+    """Anthropic system blocks with the whole system prompt marked as a cacheable prefix."""
+    if not cache_prompt or not system_message:
+        return system_message
+    return [{"type": "text", "text": system_message, "cache_control": {"type": "ephemeral"}}]
+
+
+def _prompt_cache_extra_body(client: Any, cache_prompt: bool) -> Optional[Dict[str, Any]]:
+    """Ask llama.cpp-style local servers to keep the prompt's KV cache between requests.
+
+    OpenAI caches prefixes automatically and rejects unknown fields, as do Groq and
+    Azure, so the flag is only sent to other OpenAI-compatible endpoints.
+    """
+    if not cache_prompt or isinstance(client, AzureOpenAI):
+        return None
+    host = str(getattr(client, "base_url", ""))
+    if "api.openai.com" in host or "api.groq.com" in host:
+        return None
+    return {"cache_prompt": True}
+
+
+def _openai_structured(json_schema: Optional[Dict[str, Any]], schema_name: str) -> Dict[str, Any]:
+    if json_schema is None:
+        return {}
+    return {"response_format": {
+        "type": "json_schema",
+        "json_schema": {"name": schema_name, "schema": json_schema, "strict": True}
+    }}
+
+
+def _anthropic_structured(json_schema: Optional[Dict[str, Any]], schema_name: str) -> Dict[str, Any]:
+    """Anthropic has no response format; forcing a single tool call gives schema-shaped input instead."""
+    if json_schema is None:
+        return {}
+    return {
+        "tools": [{"name": schema_name, "description": "Return the response in this structure.", "input_schema": json_schema}],
+        "tool_choice": {"type": "tool", "name": schema_name},
+    }
+
+
+def _split_system_message(messages: List[Dict]):
+    system_message = ""
+    chat_messages = []
+    for message in messages:
+        if message.get("role") == "system":
+            system_message = message.get("content", "")
+        elif message.get("role") in ["user", "assistant"]:
+            chat_messages.append({"role": message.get("role"), "content": message.get("content", "")})
+    return system_message, chat_messages
+
+
+def stream_text(
+    client: Any = None,
+    messages: Optional[List[Dict]] = None,
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 512,
+    temperature: float = 0.7,
+    metrics: Optional[List[Dict[str, float]]] = None,
+    cache_prompt: bool = False,
+    usage: Optional[TokenUsage] = None,
+    json_schema: Optional[Dict[str, Any]] = None,
+    schema_name: str = "response"
+) -> Iterator[str]:
+    """Yield completion text deltas as the provider streams them.
+
+    When the stream finishes, time to first token, duration and tokens/sec are
+    logged and, if `metrics` is given, appended to it as a dict. With
+    `json_schema`, the deltas are pieces of the structured JSON output (see
+    `generate_text`).
+    """
+    if client is None:
+        raise ValueError("Client is required")
+
+    if messages is None or not messages:
+        raise ValueError("Messages are required")
+
+    start = time.monotonic()
+    first_token = None
+    parts = []
+
+    def deltas() -> Iterator[str]:
+        system_message, chat_messages = _split_system_message(messages)
+        if isinstance(client, genai.Client):
+            last_usage = None
+            contents = [
+                {"role": "model" if message["role"] == "assistant" else "user", "parts": [{"text": message["content"]}]}
+                for message in chat_messages
+            ]
+            for chunk in client.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=genai.types.GenerateContentConfig(
+                    system_instruction=system_message or None,
+                    max_output_tokens=max_tokens,
+                    temperature=temperature,
+                    **({"response_mime_type": "application/json", "response_schema": json_schema} if json_schema else {})
+                ),
+            ):
+                last_usage = getattr(chunk, "usage_metadata", None) or last_usage
+                if chunk.text:
+                    yield chunk.text
+            if usage is not None:
+                usage.record(last_usage)
+        elif isinstance(client, Anthropic):
+            with client.messages.stream(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=_cacheable_system(system_message, cache_prompt),
+                messages=chat_messages,
+                **_anthropic_structured(json_schema, schema_name)
+            ) as stream:
+                if json_schema is None:
+                    yield from stream.text_stream
+                else:
+                    for event in stream:
+                        delta = getattr(event, "delta", None)
+                        if event.type == "content_block_delta" and getattr(delta, "type", None) == "input_json_delta":
+                            yield delta.partial_json
+                if usage is not None:
+                    usage.record(stream.get_final_message().usage)
+        else:
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                **({"stream_options": {"include_usage": True}} if usage is not None else {}),
+                **_openai_structured(json_schema, schema_name),
+                extra_body=_prompt_cache_extra_body(client, cache_prompt),
+            )
+            for chunk in response:
+                if usage is not None and getattr(chunk, "usage", None) is not None:
+                    usage.record(chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    for delta in deltas():
+        if first_token is None:
+            first_token = time.monotonic()
+        parts.append(delta)
+        yield delta
+
+    end = time.monotonic()
+    tokens = estimate_tokens("".join(parts))
+    generating = end - (first_token if first_token is not None else start)
+    call_metrics = {
+        "ttft": (first_token - start) if first_token is not None else None,
+        "duration": end - start,
+        "tokens": tokens,
+        "tokens_per_sec": tokens / generating if generating > 0 else 0.0,
+    }
+    ttft = f"{call_metrics['ttft']:.2f}s" if call_metrics["ttft"] is not None else "n/a"
+    logger.info(f"Streamed {tokens} tokens from {model}: TTFT {ttft}, {call_metrics['tokens_per_sec']:.1f} tokens/sec")
+    if metrics is not None:
+        metrics.append(call_metrics)
+
+
 def generate_text(
     client: Any = None,
     messages: Optional[List[Dict]] = None,
     model: str = "gpt-4o-mini",
     max_tokens: int = 512,
-    temperature: float = 0.7
+    temperature: float = 0.7,
+    on_delta: Optional[Callable[[str], None]] = None,
+    metrics: Optional[List[Dict[str, float]]] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    cache_prompt: bool = False,
+    usage: Optional[TokenUsage] = None,
+    json_schema: Optional[Dict[str, Any]] = None,
+    schema_name: str = "response"
 ) -> str:
+    """Return the full completion text.
+
+    If `on_delta` or `metrics` is given, the completion is streamed with
+    `stream_text` and each delta is passed to `on_delta` as it arrives.
+    With a `rate_limiter`, the call waits for budget (prompt plus `max_tokens`
+    tokens) and is retried when the provider rate-limits it.
+
+    `cache_prompt` marks the system prompt as a reusable prefix: Anthropic gets
+    `cache_control` on it and llama.cpp-style servers get `cache_prompt`, while
+    OpenAI caches shared prefixes on its own. Keep the stable instructions in the
+    system message and the varying text after them. Prompt and cached token
+    counts are added to `usage` when given.
+
+    With `json_schema`, the provider is asked for structured output matching it
+    (`response_format` for OpenAI-compatible servers, a forced tool call for
+    Anthropic, a response schema for Gemini) and the JSON text is returned.
+    """
     if client is None:
         raise ValueError("Client is required")
     
     if messages is None or not messages:
         raise ValueError("Messages are required")
+
+    if rate_limiter is not None:
+        tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages) + max_tokens
+        return rate_limiter.call(
+            lambda: generate_text(
+                client, messages, model, max_tokens, temperature, on_delta, metrics,
+                cache_prompt=cache_prompt, usage=usage, json_schema=json_schema, schema_name=schema_name
+            ),
+            tokens=tokens
+        )
+
+    if on_delta is not None or metrics is not None:
+        parts = []
+        for delta in stream_text(client, messages, model, max_tokens, temperature, metrics, cache_prompt, usage, json_schema, schema_name):
+            parts.append(delta)
+            if on_delta is not None:
+                on_delta(delta)
+        return "".join(parts)
     
     if isinstance(client, genai.Client):
         system_message = None
@@ -183,9 +784,12 @@ def generate_text(
             generation_config=genai.GenerationConfig(
                 system_instruction=system_message,
                 max_output_tokens=max_tokens,
-                temperature=temperature
+                temperature=temperature,
+                **({"response_mime_type": "application/json", "response_schema": json_schema} if json_schema else {})
             ),
         )
+        if usage is not None:
+            usage.record(getattr(response, "usage_metadata", None))
         return response.text
     elif isinstance(client, Anthropic):
         system_message = ""
@@ -204,9 +808,16 @@ def generate_text(
             model=model,
             max_tokens=max_tokens,
             temperature=temperature,
-            system=system_message,
-            messages=anthropic_messages
+            system=_cacheable_system(system_message, cache_prompt),
+            messages=anthropic_messages,
+            **_anthropic_structured(json_schema, schema_name)
         )
+        if usage is not None:
+            usage.record(response.usage)
+        if json_schema is not None:
+            for block in response.content:
+                if getattr(block, "type", None) == "tool_use":
+                    return json.dumps(block.input, ensure_ascii=False)
         return response.content[0].text
     else:
         response = client.chat.completions.create(
@@ -214,7 +825,11 @@ def generate_text(
             messages=messages,
             max_tokens=max_tokens,
             temperature=temperature,
+            extra_body=_prompt_cache_extra_body(client, cache_prompt),
+            **_openai_structured(json_schema, schema_name),
         )
+        if usage is not None:
+            usage.record(response.usage)
         return response.choices[0].message.content
 
 
@@ -224,8 +839,14 @@ def generate_speech(
     voice: str = "alloy",
     model_name: str = "tts-1",
     response_format: str = "wav",
-    output_path: str = "output"
+    output_path: str = "output",
+    rate_limiter: Optional[RateLimiter] = None
 ):
+    if rate_limiter is not None:
+        return rate_limiter.call(
+            lambda: generate_speech(client, text, voice, model_name, response_format, output_path)
+        )
+
     if isinstance(client, ElevenLabs):
         file_extension = response_format.split('_')[0].split('-')[0]
         audio = client.text_to_speech.convert(
@@ -1,7 +1,7 @@
 from .helpers import SINGLE_SPEAKER_FORMATS, THREE_SPEAKER_FORMATS, FOUR_SPEAKER_FORMATS, FIVE_SPEAKER_FORMATS
 
 
-step1_prompt = """You are a world class text pre-processor, here is the raw data from a PDF, please parse and return it in a way that is crispy and usable to send to a {format_type} writer.
+_step1_instructions = """You are a world class text pre-processor, here is the raw data from a PDF, please parse and return it in a way that is crispy and usable to send to a {format_type} writer.
 
 The raw data is messed up with new lines, Latex math and you will see fluff that we can remove completely. Basically take away any details that you think might be useless in a {format_type} author's transcript.
 
@@ -16,11 +16,32 @@ Be very smart and aggressive with removing details, you will get a running porti
 PLEASE DO NOT ADD MARKDOWN FORMATTING, STOP ADDING SPECIAL CHARACTERS THAT MARKDOWN CAPATILISATION ETC LIKES.
 
 ALWAYS start your response directly with processed text and NO ACKNOWLEDGEMENTS about my questions ok?
-Here is the text:
+"""
+
+# The instructions go in the system message and only the text in the user message,
+# so every chunk request shares the same cacheable prefix.
+step1_system_prompt = _step1_instructions
+
+step1_prompt = """Here is the text:
 
 {text_chunk}
 """
 
+step1_pack_system_prompt = _step1_instructions + """
+The text you get is split into numbered sections. Clean each section on its own and return every section wrapped in the same markers, in the same order, like this:
+
+<<<CHUNK 1>>>
+cleaned text of section 1
+<<<END CHUNK 1>>>
+
+Do not merge, skip or add sections, and do not write anything outside the markers.
+"""
+
+step1_pack_prompt = """Here is the text, split into {num_chunks} sections:
+
+{packed_chunks}
+"""
+
 
 step2_system_prompt_1_speaker = """You are the world-class {format_type} writer, you have worked as a ghostwriter for Joe Rogan, Lex Fridman, Ben Shapiro, Tim Ferris.
 
@@ -312,6 +333,21 @@ DO NOT include episode titles, named speakers, intros, or section headers—ONLY
 """
 
 
+step2_map_prompt = """You are preparing research notes for a {format_type} writer. You will be given one part of a longer document.
+
+Write a dense, ordered outline of this part: every key idea, finding, number, definition and example the writer will need, as short bullet points. Keep technical terms exactly as written. Do not write dialogue, introductions or conclusions, and do not mention that this is a part of a larger document.
+
+MY PREFERENCES:
+"{preference_text}"
+"""
+
+
+step2_summary_prompt = """You keep a running list of the topics a {format_type} transcript has already covered.
+
+You will be given the current list and the newest part of the transcript. Return the updated list as terse bullet points, one topic per line, merging or shortening older entries so the whole list stays under {max_words} words. Return only the list.
+"""
+
+
 step3_system_promp = """You are an international award-winning screenwriter, content re-writer, content formater, and translator.
 
 You have been working with multiple award-winning creators across {format_type}.
@@ -340,6 +376,18 @@ Ensure your output is in the correct tuple format, the speaker’s dialogue rema
 DO NOT include episode titles, named speakers, intros, section headers, or ``` — ONLY provide raw dialogue labeled as ‘Speaker 1,’ ‘Speaker 2,’ etc. ONLY ONE SPEAKER CAN TALK AT A TIME."""
 
 
+step3_handoff_prompt = """You will be given one part of a {format_type} transcript.
+
+In under {max_words} words, describe where the conversation stands at the end of this part: the topic being discussed, which speaker spoke last and what they were saying, and any question left open. Return only the description.
+"""
+
+
+step3_seam_prompt = """You are an editor joining two parts of a {format_type} transcript that were rewritten separately. You will be given the turns on both sides of the join, in order.
+
+Rewrite only these turns so the conversation flows naturally across the join: remove repeated sentences, greetings, goodbyes or re-introductions of the topic, and make the hand-off between speakers consistent. Keep the same speakers, the same language ({language}), every fact, and roughly the same number of turns. Do not add new content.
+"""
+
+
 gen_z_mapping_prompt = """Infuse humor, pop culture references, and a very laid-back conversational tone. Keep it **engaging, slightly chaotic, and fun, but still clear and informative.** Use modern wording naturally, like:  
 - **Bet** – Agreement or confirmation (e.g., 'You down?' – 'Bet.')
 - **Rizz** – Charisma or flirting skills (e.g., 'Dude got W rizz.')
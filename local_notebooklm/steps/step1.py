@@ -1,7 +1,11 @@
-from .helpers import generate_text, FormatType, wait_for_next_step
-from typing import Optional, List, Dict, Any
-from .prompts import step1_prompt
-import logging, PyPDF2, os, time
+from .helpers import generate_text, FormatType, RateLimiter, TokenUsage, Counters, get_rate_limiter, token_counter_for, estimate_tokens
+from .cache import ChunkCache, ChunkCheckpoint
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Callable
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from .prompts import step1_system_prompt, step1_prompt, step1_pack_system_prompt, step1_pack_prompt
+from PyPDF2.errors import PdfReadError
+from collections import Counter, deque
+import hashlib, logging, PyPDF2, os, re, threading, time, unicodedata, zlib
 from pathlib import Path
 from tqdm import tqdm
 
@@ -24,85 +28,639 @@ def validate_pdf(file_path: str) -> bool:
         raise PDFValidationError("File is not a PDF")
     return True
 
-def get_pdf_metadata(file_path: str) -> Optional[dict]:
-    try:
-        if not validate_pdf(file_path):
+class PDFDocument:
+    """Parses a PDF once and serves page count, metadata and memoized per-page text from one reader.
+
+    With a `page_store`, extracted text is persisted per page keyed by a hash of the
+    page's content stream, so unchanged pages of a revised PDF are never re-extracted.
+    """
+
+    def __init__(self, file_path: str, page_store: Optional[ChunkCheckpoint] = None):
+        validate_pdf(file_path)
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        try:
+            self.reader = PyPDF2.PdfReader(self._file)
+        except Exception:
+            self._file.close()
+            raise
+        self._page_texts: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self.page_store = page_store
+        self.pages_changed = 0
+        self.pages_reused = 0
+
+    @property
+    def num_pages(self) -> int:
+        return len(self.reader.pages)
+
+    @property
+    def metadata(self):
+        return self.reader.metadata
+
+    def page_fingerprint(self, page_num: int) -> str:
+        contents = self.reader.pages[page_num].get_contents()
+        streams = contents if isinstance(contents, list) else [contents]
+        digest = hashlib.sha256()
+        for stream in streams:
+            if stream is not None:
+                digest.update(stream.get_object().get_data())
+        return digest.hexdigest()
+
+    def _restore_page_text(self, page_num: int) -> Optional[str]:
+        if self.page_store is None:
             return None
+        fingerprint = self.page_fingerprint(page_num)
+        if self.page_store.hash_at(page_num) != fingerprint:
+            self.pages_changed += 1
+        text = self.page_store.get(page_num, fingerprint)
+        if text is not None:
+            self.pages_reused += 1
+        return text
+
+    def _store_page_text(self, page_num: int, text: str):
+        if self.page_store is not None:
+            self.page_store.record(
+                page_num,
+                self.page_fingerprint(page_num),
+                text,
+                text_hash=hashlib.sha256(text.encode('utf-8')).hexdigest()
+            )
+
+    def page_text(self, page_num: int) -> str:
+        with self._lock:
+            if page_num not in self._page_texts:
+                text = self._restore_page_text(page_num)
+                if text is None:
+                    text = self.reader.pages[page_num].extract_text() or ""
+                    self._store_page_text(page_num, text)
+                self._page_texts[page_num] = text
+            return self._page_texts[page_num]
 
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            metadata = {
-                'num_pages': len(pdf_reader.pages),
-                'metadata': pdf_reader.metadata
-            }
-            return metadata
+    def set_page_texts(self, start: int, texts: List[str]):
+        with self._lock:
+            for offset, text in enumerate(texts):
+                if start + offset not in self._page_texts:
+                    self._page_texts[start + offset] = text
+                    self._store_page_text(start + offset, text)
+
+    def has_page_text(self, page_num: int) -> bool:
+        with self._lock:
+            if page_num not in self._page_texts:
+                text = self._restore_page_text(page_num)
+                if text is None:
+                    return False
+                self._page_texts[page_num] = text
+            return True
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def open_pdf(file_path: str, page_store: Optional[ChunkCheckpoint] = None) -> PDFDocument:
+    try:
+        return PDFDocument(file_path, page_store=page_store)
     except PDFValidationError as e:
         raise e
+    except PdfReadError as e:
+        raise PDFExtractionError(f"Invalid or corrupted PDF file: {str(e)}")
     except Exception as e:
-        raise PDFExtractionError(f"Failed to extract metadata: {str(e)}")
+        raise PDFExtractionError(f"Failed to open PDF: {str(e)}")
 
-def extract_text_from_pdf(file_path: str, max_chars: int = 100000) -> str:
+def get_pdf_metadata(file_path: str, document: Optional[PDFDocument] = None) -> Optional[dict]:
     try:
-        if not validate_pdf(file_path):
+        if document is None:
+            with open_pdf(file_path) as document:
+                return get_pdf_metadata(file_path, document)
+
+        metadata = {
+            'num_pages': document.num_pages,
+            'metadata': document.metadata
+        }
+        return metadata
+    except PDFValidationError as e:
+        raise e
+    except Exception as e:
+        raise PDFExtractionError(f"Failed to extract metadata: {str(e)}")
+
+KNOWN_SECTIONS = {
+    "abstract", "introduction", "background", "related work", "method", "methods", "approach",
+    "experiments", "results", "discussion", "conclusion", "conclusions", "limitations",
+    "acknowledgments", "acknowledgements", "references", "bibliography", "appendix",
+    "appendices", "supplementary material"
+}
+BACK_MATTER = ("references", "bibliography", "appendix", "appendices", "supplementary")
+NUMBERED_HEADING = re.compile(r'^(?P<num>\d{1,2}(?:\.\d{1,2})*|[A-Z](?:\.\d{1,2})*)\.?\s+(?P<title>[A-Z][^.]{1,80})$')
+
+# A lone capital letter inside a title, like the author initials in a reference entry
+INITIAL = re.compile(r'\b[A-Z]\b\.?\s')
+
+def _normalize_title(title: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '', title.lower())
+
+class SectionFilter:
+    """Drops sections (e.g. References, Appendix) from page text before chunking.
+
+    Headings come from the PDF outline when it has one, and from heading heuristics
+    otherwise: numbered headings that follow in sequence ("3.", "3.1"), plus
+    well-known unnumbered section names. Lettered headings after the references
+    are treated as appendix sections when they follow in sequence ("A.", "A.1",
+    "B."). Section names in `include` and
+    `exclude` match case-insensitively as substrings of the heading title. Pages
+    that lie entirely inside an excluded top-level outline section are skipped
+    without extraction.
+    """
+
+    def __init__(
+            self,
+            include: Optional[List[str]] = None,
+            exclude: Optional[List[str]] = None,
+            outline: Optional[List[tuple]] = None
+        ):
+        self.include = [term.lower() for term in include or []]
+        self.exclude = [term.lower() for term in exclude or []]
+        self.outline = outline or []
+        self._outline_titles = {
+            _normalize_title(re.sub(r'^Appendix ', '', title)): level for title, level, _ in self.outline
+        }
+        self.top_title = "Abstract"
+        self.sub_title = None
+        self.top_number = None
+        self.top_letter = None
+        self.in_back_matter = False
+        self.chars_removed = 0
+        self.skipped_pages = set()
+
+    @classmethod
+    def from_document(cls, document: PDFDocument, include=None, exclude=None) -> "SectionFilter":
+        outline = []
+
+        def walk(items, level):
+            for item in items:
+                if isinstance(item, list):
+                    walk(item, level + 1)
+                    continue
+                try:
+                    outline.append((str(item.title), level, document.reader.get_destination_page_number(item)))
+                except Exception:
+                    continue
+
+        try:
+            walk(document.reader.outline or [], 1)
+        except Exception as e:
+            logger.debug(f"Could not read PDF outline: {e}")
+
+        # Top-level entries after the references are appendix sections.
+        in_back_matter = False
+        for i, (title, level, page) in enumerate(outline):
+            if level != 1:
+                continue
+            if any(term in title.lower() for term in BACK_MATTER):
+                in_back_matter = True
+            elif in_back_matter:
+                outline[i] = (f"Appendix {title}", level, page)
+        return cls(include=include, exclude=exclude, outline=outline)
+
+    def _matches(self, title: Optional[str], terms: List[str]) -> bool:
+        return bool(title) and any(term in title.lower() for term in terms)
+
+    def _section_allowed(self) -> bool:
+        titles = [self.top_title, self.sub_title]
+        if any(self._matches(title, self.exclude) for title in titles):
+            return False
+        if self.include:
+            return any(self._matches(title, self.include) for title in titles)
+        return True
+
+    def _title_allowed(self, title: str) -> bool:
+        if self._matches(title, self.exclude):
+            return False
+        return not self.include or self._matches(title, self.include)
+
+    def skip_page(self, page_num: int) -> bool:
+        top_level = sorted((page, title) for title, level, page in self.outline if level == 1)
+        for i, (start, title) in enumerate(top_level):
+            next_start = top_level[i + 1][0] if i + 1 < len(top_level) else None
+            if start < page_num and (next_start is None or next_start > page_num):
+                if not self._title_allowed(title):
+                    self.skipped_pages.add(page_num)
+                    return True
+                return False
+        return False
+
+    def _heading(self, line: str) -> Optional[tuple]:
+        """Return (level, title) if the line is a section heading."""
+        stripped = ' '.join(line.split())
+        if not stripped or len(stripped) > 90:
             return None
+        normalized = _normalize_title(stripped)
+
+        if self._outline_titles:
+            for title, level in self._outline_titles.items():
+                if title and normalized.endswith(title) and len(normalized) - len(title) <= 6:
+                    if self.in_back_matter and level == 1 and not any(term in title for term in BACK_MATTER):
+                        return level, f"Appendix {stripped}"
+                    return level, stripped
+            if stripped.lower() in KNOWN_SECTIONS:
+                return 1, stripped
+            return None
+
+        if stripped.lower() in KNOWN_SECTIONS:
+            return 1, stripped
+        match = NUMBERED_HEADING.match(stripped)
+        if not match or len(match.group('title').split()) > 12:
+            return None
+        parts = match.group('num').split('.')
+        if parts[0].isdigit():
+            number = int(parts[0])
+            if len(parts) == 1 and (self.top_number is None or number == self.top_number + 1):
+                self.top_number = number
+                return 1, stripped
+            if len(parts) > 1 and number == self.top_number:
+                return 2, stripped
+            return None
+        if not self.in_back_matter or INITIAL.search(match.group('title')):
+            # Reference entries such as "A Smith and B Jones ..." start like lettered headings.
+            return None
+        letter = parts[0]
+        if len(parts) == 1 and letter == (chr(ord(self.top_letter) + 1) if self.top_letter else "A"):
+            self.top_letter = letter
+            return 1, f"Appendix {stripped}"
+        if len(parts) > 1 and letter == self.top_letter:
+            return 2, f"Appendix {stripped}"
+        return None
+
+    def filter_page(self, text: str) -> str:
+        if not self.include and not self.exclude:
+            return text
+        kept = []
+        for line in text.split('\n'):
+            heading = self._heading(line)
+            if heading is not None:
+                level, title = heading
+                if level == 1:
+                    self.top_title, self.sub_title = title, None
+                    if any(term in title.lower() for term in BACK_MATTER):
+                        self.in_back_matter = True
+                else:
+                    self.sub_title = title
+            if self._section_allowed():
+                kept.append(line)
+            else:
+                self.chars_removed += len(line) + 1
+        return '\n'.join(kept)
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[page_num].extract_text() or "" for page_num in range(start, end)]
+
+def iter_page_texts(
+        document: PDFDocument,
+        workers: int = 1,
+        pages_per_task: int = 8,
+        skip_page: Optional[Callable[[int], bool]] = None
+    ) -> Iterator[str]:
+    """Yield page texts in page order, optionally extracting page ranges in worker processes.
+
+    At most `workers` page ranges are in flight, so closing the generator early
+    (e.g. at the `max_chars` cutoff) bounds how far extraction runs ahead. Pages
+    already memoized on the document are never extracted again, and pages for which
+    `skip_page` returns True are yielded as empty strings without being extracted.
+    """
+    num_pages = document.num_pages
+    skip_page = skip_page or (lambda page_num: False)
+    if workers <= 1 or num_pages <= pages_per_task:
+        for page_num in range(num_pages):
+            yield "" if skip_page(page_num) else document.page_text(page_num)
+        return
+
+    # Not a `with` block: leaving one waits for every running range, which would
+    # extract pages past the `max_chars` cutoff after the generator is closed.
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+
+    def drain(item):
+        start, end, future = item
+        if future is not None:
+            document.set_page_texts(start, future.result())
+        for page_num in range(start, end):
+            yield "" if skip_page(page_num) else document.page_text(page_num)
+
+    try:
+        for start in range(0, num_pages, pages_per_task):
+            end = min(start + pages_per_task, num_pages)
+            future = None
+            needed = [page_num for page_num in range(start, end) if not skip_page(page_num)]
+            if not all(document.has_page_text(page_num) for page_num in needed):
+                future = executor.submit(_extract_page_range, document.file_path, start, end)
+            pending.append((start, end, future))
+            if len(pending) >= workers:
+                yield from drain(pending.popleft())
+        while pending:
+            yield from drain(pending.popleft())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_pdf_text(
+        file_path: str,
+        max_chars: int = 100000,
+        workers: int = 1,
+        document: Optional[PDFDocument] = None,
+        section_filter: Optional["SectionFilter"] = None
+    ) -> Iterator[str]:
+    """Stream page texts out of the PDF, truncating at the `max_chars` cutoff.
 
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            num_pages = len(pdf_reader.pages)
-            logger.info(f"Processing PDF with {num_pages} pages")
+    With a `section_filter`, unwanted sections are dropped before the cutoff is applied,
+    so the character budget is spent on the sections that are kept.
+    """
+    owns_document = document is None
+    try:
+        if owns_document:
+            document = open_pdf(file_path)
 
-            extracted_text = []
-            total_chars = 0
+        num_pages = document.num_pages
+        logger.info(f"Processing PDF with {num_pages} pages")
 
-            for page_num in range(num_pages):
-                page = pdf_reader.pages[page_num]
-                text = page.extract_text() or ""
+        total_chars = 0
 
+        page_texts = iter_page_texts(
+            document,
+            workers=workers,
+            skip_page=section_filter.skip_page if section_filter is not None else None
+        )
+        try:
+            for page_num, text in enumerate(page_texts):
+                if section_filter is not None:
+                    text = section_filter.filter_page(text)
                 if total_chars + len(text) > max_chars:
                     remaining_chars = max_chars - total_chars
-                    extracted_text.append(text[:remaining_chars])
+                    yield text[:remaining_chars]
                     logger.info(f"Reached {max_chars} character limit at page {page_num + 1}")
                     break
 
-                extracted_text.append(text)
+                yield text
                 total_chars += len(text)
                 logger.debug(f"Processed page {page_num + 1}/{num_pages}")
+        finally:
+            page_texts.close()
 
-            final_text = '\n'.join(extracted_text)
-            logger.info(f"Extraction complete. Total characters: {len(final_text)}")
-            return final_text
-
-    except PDFValidationError as e:
+    except PDFProcessingError as e:
         raise e
-    except PyPDF2.PdfReadError as e:
+    except PdfReadError as e:
         raise PDFExtractionError(f"Invalid or corrupted PDF file: {str(e)}")
     except Exception as e:
         raise PDFExtractionError(f"Failed to extract text: {str(e)}")
+    finally:
+        if owns_document and document is not None:
+            document.close()
+
+def extract_text_from_pdf(
+        file_path: str,
+        max_chars: int = 100000,
+        workers: int = 1,
+        document: Optional[PDFDocument] = None,
+        section_filter: Optional["SectionFilter"] = None
+    ) -> str:
+    final_text = '\n'.join(iter_pdf_text(
+        file_path, max_chars, workers=workers, document=document, section_filter=section_filter
+    ))
+    logger.info(f"Extraction complete. Total characters: {len(final_text)}")
+    return final_text
+
+class BoilerplateStripper:
+    """Strips running headers, footers and page numbers that repeat across pages.
+
+    The first and last `edge_lines` non-empty lines of every page are normalized
+    (digits collapsed, case and spacing folded) and their hashes counted once per
+    page. A line is boilerplate when its hash appears on at least `min_pages` pages
+    and on `min_ratio` of the pages seen so far. The first `window` pages are
+    buffered to learn the counts before anything is emitted, so memory stays
+    bounded and streaming resumes after the window. The default window equals
+    `min_pages`, the fewest pages on which a header can be recognized, so the
+    first chunk is held back by only a few pages.
+    """
+
+    def __init__(self, window: int = 3, edge_lines: int = 3, min_pages: int = 3, min_ratio: float = 0.5):
+        self.window = window
+        self.edge_lines = edge_lines
+        self.min_pages = min_pages
+        self.min_ratio = min_ratio
+        self.line_counts = Counter()
+        self.pages_seen = 0
+        self.chars_removed = 0
+        self.lines_removed = 0
+
+    @staticmethod
+    def _line_hash(line: str) -> int:
+        normalized = re.sub(r'\d+', '#', ' '.join(line.lower().split()))
+        return hash(normalized)
+
+    def _edge_indices(self, lines: List[str]) -> List[int]:
+        non_empty = [i for i, line in enumerate(lines) if line.strip()]
+        return sorted(set(non_empty[:self.edge_lines] + non_empty[-self.edge_lines:]))
+
+    def observe(self, page_text: str):
+        lines = page_text.split('\n')
+        self.line_counts.update({self._line_hash(lines[i]) for i in self._edge_indices(lines)})
+        self.pages_seen += 1
+
+    def _is_boilerplate(self, line_hash: int) -> bool:
+        count = self.line_counts[line_hash]
+        return count >= self.min_pages and count >= self.min_ratio * self.pages_seen
+
+    def strip_page(self, page_text: str) -> str:
+        lines = page_text.split('\n')
+        drop = {i for i in self._edge_indices(lines) if self._is_boilerplate(self._line_hash(lines[i]))}
+        for i in drop:
+            self.chars_removed += len(lines[i]) + 1
+        self.lines_removed += len(drop)
+        return '\n'.join(line for i, line in enumerate(lines) if i not in drop)
+
+    def strip(self, pages: Iterable[str]) -> Iterator[str]:
+        buffered = []
+        for page_text in pages:
+            self.observe(page_text)
+            if buffered is not None:
+                buffered.append(page_text)
+                if len(buffered) < self.window:
+                    continue
+                for buffered_text in buffered:
+                    yield self.strip_page(buffered_text)
+                buffered = None
+            else:
+                yield self.strip_page(page_text)
+        for buffered_text in buffered or []:
+            yield self.strip_page(buffered_text)
+
+ANCHOR_WINDOW = 3
+ANCHOR_MIN_FILL = 0.8
 
-def create_word_bounded_chunks(text: str, target_chunk_size: int) -> List[str]:
+def anchor_spacing(target_chunk_size: int, count_tokens: Optional[Callable[[str], int]] = None) -> int:
+    """Words between content anchors, so a chunk usually meets about two anchors in the last quarter of its budget."""
+    sample = "the model learns useful representations from large amounts of unlabeled speech and text"
+    size_per_word = (count_tokens(" " + sample) if count_tokens else len(sample) + 1) / len(sample.split())
+    return max(2, int(target_chunk_size / size_per_word * (1 - ANCHOR_MIN_FILL) / 2))
+
+def iter_word_bounded_chunks(
+        texts: Iterable[str],
+        target_chunk_size: int,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        anchor_every: Optional[int] = None,
+        provenance: Optional[List[List[int]]] = None
+    ) -> Iterator[str]:
+    """Incrementally pack words from a stream of texts into chunks, yielding each one as soon as it is full.
+
+    `target_chunk_size` is measured in characters, or in tokens when `count_tokens` is given.
+    With `anchor_every`, a chunk filled to `ANCHOR_MIN_FILL` of the target also closes
+    after any word where the hash of the last `ANCHOR_WINDOW` words is divisible by it
+    (about one position in `anchor_every`). Boundaries then depend on the local
+    content, so after an edit they line up with the previous run again within a chunk
+    or two, while chunks stay close to full. When
+    `provenance` is a list, the indices of the texts (pages) that fed each chunk are
+    appended to it as chunks are yielded.
+    """
     try:
-        words = text.split()
-        chunks = []
         current_chunk = []
         current_length = 0
+        current_pages = []
+        recent_words = deque(maxlen=ANCHOR_WINDOW)
+        anchor_length = target_chunk_size * ANCHOR_MIN_FILL
 
-        for word in words:
-            word_length = len(word) + 1
-            if current_length + word_length > target_chunk_size and current_chunk:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [word]
-                current_length = word_length
-            else:
-                current_chunk.append(word)
-                current_length += word_length
+        def emit():
+            if provenance is not None:
+                provenance.append(current_pages)
+            return ' '.join(current_chunk)
 
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+        for page_num, text in enumerate(texts):
+            for word in text.split():
+                word_length = count_tokens(" " + word) if count_tokens else len(word) + 1
+                if current_length + word_length > target_chunk_size and current_chunk:
+                    yield emit()
+                    current_chunk = [word]
+                    current_length = word_length
+                    current_pages = [page_num]
+                else:
+                    current_chunk.append(word)
+                    current_length += word_length
+                    if not current_pages or current_pages[-1] != page_num:
+                        current_pages.append(page_num)
+
+                recent_words.append(word)
+                if (
+                    anchor_every
+                    and current_length >= anchor_length
+                    and zlib.crc32(' '.join(recent_words).encode('utf-8')) % anchor_every == 0
+                ):
+                    yield emit()
+                    current_chunk = []
+                    current_length = 0
+                    current_pages = []
 
-        return chunks
+        if current_chunk:
+            yield emit()
+    except PDFProcessingError:
+        raise
     except Exception as e:
         raise ChunkProcessingError(f"Failed to create text chunks: {str(e)}")
 
+def create_word_bounded_chunks(
+        text: str,
+        target_chunk_size: int,
+        count_tokens: Optional[Callable[[str], int]] = None
+    ) -> List[str]:
+    return list(iter_word_bounded_chunks([text], target_chunk_size, count_tokens))
+
+# A word split by a line break, or by a space left where one was. "pre- and post-training"
+# is a suspended hyphen, not a split word, so a conjunction never continues the word.
+HYPHENATION_BREAK = re.compile(r'(\w)-\s*\n\s*(?!(?:and|or|nor|to)\b)(\w)|(\w)- (?!(?:and|or|nor|to)\b)([a-z])')
+LATEX_DEBRIS = re.compile(r'\\[a-zA-Z]+|\$|[_^]\{|\\\(|\\\)')
+STRAY_SYMBOL = re.compile(r'[^\w\s.,;:!?\'"()\[\]\-–—/%&+=*<>@#’‘“”…]')
+
+def score_chunk_noise(text: str) -> float:
+    """Cheap noise score: defects per 100 words plus the excess share of non-alphabetic characters."""
+    if not text:
+        return 0.0
+    words = max(len(text.split()), 1)
+    defects = (
+        len(HYPHENATION_BREAK.findall(text))
+        + len(LATEX_DEBRIS.findall(text))
+        + len(STRAY_SYMBOL.findall(text))
+    )
+    non_alpha = sum(1 for char in text if not (char.isalpha() or char.isspace()))
+    non_alpha_excess = max(0.0, non_alpha / len(text) - 0.15)
+    return defects * 100 / words + non_alpha_excess * 100
+
+def normalize_chunk(text: str) -> str:
+    """Deterministic cleanup for chunks that are already clean prose."""
+    text = unicodedata.normalize('NFKC', text)
+    text = HYPHENATION_BREAK.sub(lambda m: (m.group(1) or m.group(3)) + (m.group(2) or m.group(4)), text)
+    text = re.sub(r'[\x00-\x08\x0b-\x1f\x7f]', '', text)
+    return ' '.join(text.split())
+
+class CleaningStats(Counters):
+    """Thread-safe counters for how step1 chunks were cleaned."""
+
+    FIELDS = ("llm_calls", "fast_path", "pack_fallbacks", "resumed")
+
+    def __init__(self):
+        super().__init__()
+        self.usage = TokenUsage()
+
+    def as_dict(self) -> dict:
+        return {
+            "llm_calls": self.llm_calls, "llm_calls_saved": self.fast_path, "pack_fallbacks": self.pack_fallbacks,
+            "resumed": self.resumed, "prompt_tokens": self.usage.prompt_tokens, "cached_prompt_tokens": self.usage.cached_tokens
+        }
+
+def chunk_cache_key(text_chunk, system_prompt, model_name, max_tokens, temperature, format_type) -> str:
+    return ChunkCache.make_key(
+        text_chunk=text_chunk,
+        model_name=model_name,
+        prompt_template=step1_system_prompt + step1_prompt if system_prompt is None else system_prompt,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        format_type=format_type
+    )
+
+def takes_fast_path(text_chunk: str, fast_path_threshold: Optional[float]) -> bool:
+    return fast_path_threshold is not None and score_chunk_noise(text_chunk) < fast_path_threshold
+
+def resolve_chunk_without_llm(
+        text_chunk,
+        system_prompt,
+        model_name,
+        max_tokens,
+        temperature,
+        format_type,
+        cache: Optional[ChunkCache] = None,
+        fast_path_threshold: Optional[float] = None,
+        stats: Optional[CleaningStats] = None,
+        chunk_num: Optional[int] = None,
+        checkpoint: Optional[ChunkCheckpoint] = None
+    ) -> Optional[str]:
+    """Return the cleaned chunk from the checkpoint, the fast path or the cache, or None if it needs the LLM."""
+    if checkpoint is not None and chunk_num is not None:
+        restored = checkpoint.get(chunk_num, chunk_cache_key(text_chunk, system_prompt, model_name, max_tokens, temperature, format_type))
+        if restored is not None:
+            if stats is not None:
+                stats.record("resumed")
+            return restored
+
+    if takes_fast_path(text_chunk, fast_path_threshold):
+        if stats is not None:
+            stats.record("fast_path")
+        return normalize_chunk(text_chunk)
+
+    if cache is not None:
+        return cache.get(chunk_cache_key(text_chunk, system_prompt, model_name, max_tokens, temperature, format_type))
+    return None
+
 def process_chunk(
         client,
         text_chunk,
@@ -111,29 +669,233 @@ def process_chunk(
         model_name,
         max_tokens,
         temperature,
-        format_type
+        format_type,
+        rate_limiter: Optional[RateLimiter] = None,
+        cache: Optional[ChunkCache] = None,
+        fast_path_threshold: Optional[float] = None,
+        stats: Optional[CleaningStats] = None,
+        checkpoint: Optional[ChunkCheckpoint] = None
+    ) -> str:
+    try:
+        resolved = resolve_chunk_without_llm(
+            text_chunk, system_prompt, model_name, max_tokens, temperature, format_type,
+            cache=cache, fast_path_threshold=fast_path_threshold, stats=stats,
+            chunk_num=chunk_num, checkpoint=checkpoint
+        )
+        if resolved is not None:
+            return resolved
+    except Exception as e:
+        raise ChunkProcessingError(f"Failed to process chunk {chunk_num}: {str(e)}")
+
+    return clean_chunk_with_llm(
+        client, text_chunk, system_prompt, chunk_num, model_name, max_tokens, temperature, format_type,
+        rate_limiter=rate_limiter, cache=cache, stats=stats
+    )
+
+def clean_chunk_with_llm(
+        client,
+        text_chunk,
+        system_prompt,
+        chunk_num,
+        model_name,
+        max_tokens,
+        temperature,
+        format_type,
+        rate_limiter: Optional[RateLimiter] = None,
+        cache: Optional[ChunkCache] = None,
+        stats: Optional[CleaningStats] = None
     ) -> str:
+    """Clean one chunk with the model and cache the result; callers have already checked `resolve_chunk_without_llm`."""
     try:
-        wait_for_next_step()
         if system_prompt == None:
-            system = step1_prompt.format(text_chunk=text_chunk, format_type=format_type)
+            messages = [
+                {"role": "system", "content": step1_system_prompt.format(format_type=format_type)},
+                {"role": "user", "content": step1_prompt.format(text_chunk=text_chunk)},
+            ]
         else:
-            system = system_prompt
-            
-        messages = [
-            {"role": "user", "content": system},
-        ]
-        return generate_text(
+            messages = [
+                {"role": "user", "content": system_prompt},
+            ]
+        processed_chunk = generate_text(
             client=client,
             model=model_name,
             messages=messages,
             max_tokens=max_tokens,
             temperature=temperature,
+            rate_limiter=rate_limiter,
+            cache_prompt=True,
+            usage=stats.usage if stats is not None else None,
         )
+        if stats is not None:
+            stats.record("llm_calls")
+        if cache is not None:
+            cache.put(chunk_cache_key(text_chunk, system_prompt, model_name, max_tokens, temperature, format_type), processed_chunk)
+        return processed_chunk
 
     except Exception as e:
         raise ChunkProcessingError(f"Failed to process chunk {chunk_num}: {str(e)}")
 
+PACKED_SECTION = re.compile(r'<<<CHUNK (\d+)>>>\s*(.*?)\s*<<<END CHUNK \1>>>', re.DOTALL)
+
+def split_packed_response(response: str, num_chunks: int) -> Optional[List[str]]:
+    """Split a packed response back into per-chunk outputs, or None if it fails validation."""
+    sections = {}
+    for match in PACKED_SECTION.finditer(response or ""):
+        index = int(match.group(1))
+        if index in sections:
+            return None
+        sections[index] = match.group(2)
+    if sorted(sections) != list(range(1, num_chunks + 1)):
+        return None
+    if any(not sections[index].strip() for index in sections):
+        return None
+    return [sections[index] for index in range(1, num_chunks + 1)]
+
+def pack_chunks(chunks: Iterable[str], token_budget: int, count_tokens: Callable[[str], int]) -> Iterator[List[str]]:
+    """Group consecutive chunks into packs whose combined size stays within `token_budget` tokens."""
+    pack = []
+    pack_tokens = 0
+    for chunk in chunks:
+        chunk_tokens = count_tokens(chunk)
+        if pack and pack_tokens + chunk_tokens > token_budget:
+            yield pack
+            pack = []
+            pack_tokens = 0
+        pack.append(chunk)
+        pack_tokens += chunk_tokens
+    if pack:
+        yield pack
+
+def process_chunk_pack(
+        client,
+        chunks: List[str],
+        first_chunk_num: int,
+        system_prompt,
+        model_name,
+        max_tokens,
+        temperature,
+        format_type,
+        rate_limiter: Optional[RateLimiter] = None,
+        cache: Optional[ChunkCache] = None,
+        fast_path_threshold: Optional[float] = None,
+        stats: Optional[CleaningStats] = None,
+        checkpoint: Optional[ChunkCheckpoint] = None
+    ) -> List[str]:
+    """Clean several chunks in one request, falling back to single-chunk calls if the split fails.
+
+    Every finished chunk except fast-path ones is recorded in `checkpoint` as soon as its pack completes.
+    """
+    chunk_kwargs = dict(
+        client=client,
+        system_prompt=system_prompt,
+        model_name=model_name,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        format_type=format_type,
+        rate_limiter=rate_limiter,
+        cache=cache,
+        stats=stats
+    )
+
+    results = []
+    todo = []
+    for i, chunk in enumerate(chunks):
+        resolved = resolve_chunk_without_llm(
+            chunk, system_prompt, model_name, max_tokens, temperature, format_type,
+            cache=cache, fast_path_threshold=fast_path_threshold, stats=stats,
+            chunk_num=first_chunk_num + i, checkpoint=checkpoint
+        )
+        results.append(resolved)
+        if resolved is None:
+            todo.append(i)
+
+    if system_prompt is not None:
+        # Custom prompts do not embed the chunk text, so they are never packed.
+        for i in todo:
+            results[i] = clean_chunk_with_llm(text_chunk=chunks[i], chunk_num=first_chunk_num + i, **chunk_kwargs)
+    elif len(todo) == 1:
+        i = todo[0]
+        results[i] = clean_chunk_with_llm(text_chunk=chunks[i], chunk_num=first_chunk_num + i, **chunk_kwargs)
+    elif todo:
+        try:
+            packed_chunks = "\n\n".join(
+                f"<<<CHUNK {n}>>>\n{chunks[i]}\n<<<END CHUNK {n}>>>" for n, i in enumerate(todo, 1)
+            )
+            response = generate_text(
+                client=client,
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": step1_pack_system_prompt.format(format_type=format_type)},
+                    {"role": "user", "content": step1_pack_prompt.format(num_chunks=len(todo), packed_chunks=packed_chunks)},
+                ],
+                max_tokens=max_tokens * len(todo),
+                temperature=temperature,
+                rate_limiter=rate_limiter,
+                cache_prompt=True,
+                usage=stats.usage if stats is not None else None,
+            )
+            if stats is not None:
+                stats.record("llm_calls")
+        except Exception as e:
+            raise ChunkProcessingError(f"Failed to process chunks {first_chunk_num}-{first_chunk_num + len(chunks) - 1}: {str(e)}")
+
+        outputs = split_packed_response(response, len(todo))
+        if outputs is None:
+            logger.warning(f"Packed response for chunks starting at {first_chunk_num} failed validation, retrying one by one")
+            if stats is not None:
+                stats.record("pack_fallbacks")
+            for i in todo:
+                results[i] = clean_chunk_with_llm(text_chunk=chunks[i], chunk_num=first_chunk_num + i, **chunk_kwargs)
+        else:
+            for i, output in zip(todo, outputs):
+                results[i] = output
+                if cache is not None:
+                    cache.put(chunk_cache_key(chunks[i], system_prompt, model_name, max_tokens, temperature, format_type), output)
+
+    if checkpoint is not None:
+        for i, output in enumerate(results):
+            if takes_fast_path(chunks[i], fast_path_threshold):
+                # The checkpoint key does not cover the fast path, so a run with it turned off must not resume these.
+                continue
+            checkpoint.record(
+                first_chunk_num + i,
+                chunk_cache_key(chunks[i], system_prompt, model_name, max_tokens, temperature, format_type),
+                output
+            )
+    return results
+
+def clean_chunks(
+        chunks: Iterable[str],
+        concurrency: int = 1,
+        pack_token_budget: Optional[int] = None,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+        **chunk_kwargs
+    ) -> Iterator[str]:
+    """Clean chunks with up to `concurrency` requests in flight, yielding results in chunk order.
+
+    With `pack_token_budget`, consecutive chunks are packed into one request up to that many tokens.
+    """
+    concurrency = max(1, int(concurrency))
+    if pack_token_budget:
+        packs = pack_chunks(chunks, pack_token_budget, count_tokens)
+    else:
+        packs = ([chunk] for chunk in chunks)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+        try:
+            chunk_num = 0
+            for pack in packs:
+                pending.append(executor.submit(process_chunk_pack, chunks=pack, first_chunk_num=chunk_num, **chunk_kwargs))
+                chunk_num += len(pack)
+                if len(pending) >= concurrency:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
 def step1(
     pdf_path: str,
     client: Any = None,
@@ -146,40 +908,132 @@ def step1(
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
 
+        resume = config["Step1"].get("resume", True)
+        incremental = resume and config["Step1"].get("incremental", True)
+        page_store = ChunkCheckpoint(output_dir / 'extracted_pages.txt') if incremental else None
+        document = open_pdf(pdf_path, page_store=page_store)
+
         try:
-            metadata = get_pdf_metadata(pdf_path)
+            metadata = get_pdf_metadata(pdf_path, document)
             if metadata:
                 logger.info(f"PDF Pages: {metadata['num_pages']}")
         except PDFExtractionError as e:
             logger.warning(f"Failed to extract metadata: {e}")
 
-        extracted_text = extract_text_from_pdf(pdf_path, config["Step1"]["max_chars"])
-        if not extracted_text:
-            raise PDFExtractionError("No text extracted from PDF")
+        section_filter = None
+        if config["Step1"].get("include_sections") or config["Step1"].get("exclude_sections"):
+            section_filter = SectionFilter.from_document(
+                document,
+                include=config["Step1"].get("include_sections"),
+                exclude=config["Step1"].get("exclude_sections")
+            )
 
         input_file = output_dir / 'extracted_text.txt'
-        input_file.write_text(extracted_text, encoding='utf-8')
-
-        chunks = create_word_bounded_chunks(extracted_text, config["Step1"]["chunk_size"])
         output_file = output_dir / f"clean_{input_file.name}"
 
-        logger.info(f"Processing {len(chunks)} chunks")
+        concurrency = config["Step1"].get("concurrency", 1)
+        rate_limiter = get_rate_limiter(config["Small-Text-Model"]["provider"])
 
-        with open(output_file, 'w', encoding='utf-8') as out_file:
-            for chunk_num, chunk in enumerate(tqdm(chunks, desc="Processing chunks", disable=None)):
-                processed_chunk = process_chunk(
+        cache = None
+        if config["Step1"].get("cache_dir"):
+            cache = ChunkCache(
+                config["Step1"]["cache_dir"],
+                max_bytes=int(config["Step1"].get("cache_max_mb", 256) * 1024 * 1024)
+            )
+
+        stats = CleaningStats()
+        provenance = [] if incremental else None
+        checkpoint = ChunkCheckpoint(output_file, provenance=provenance) if resume else None
+        if checkpoint is not None and checkpoint.completed():
+            logger.info(f"Checkpoint holds {checkpoint.completed()} chunks from the last run; chunks that match are reused")
+
+        logger.info(f"Streaming chunks with concurrency {concurrency}")
+
+        try:
+            with open(input_file, 'w', encoding='utf-8') as raw_file, open(output_file, 'w', encoding='utf-8') as out_file:
+                def pages():
+                    # Mirror each page into extracted_text.txt as it streams past.
+                    for page_num, page_text in enumerate(iter_pdf_text(
+                        pdf_path,
+                        config["Step1"]["max_chars"],
+                        workers=config["Step1"].get("extraction_workers", 1),
+                        document=document,
+                        section_filter=section_filter
+                    )):
+                        raw_file.write(('\n' if page_num else '') + page_text)
+                        yield page_text
+
+                page_texts = pages()
+                stripper = None
+                if config["Step1"].get("strip_boilerplate", True):
+                    stripper = BoilerplateStripper()
+                    page_texts = stripper.strip(page_texts)
+
+                count_tokens = token_counter_for(config["Small-Text-Model"])
+                if "chunk_token_limit" in config["Step1"]:
+                    anchor_every = anchor_spacing(config["Step1"]["chunk_token_limit"], count_tokens) if incremental else None
+                    chunks = iter_word_bounded_chunks(
+                        page_texts,
+                        config["Step1"]["chunk_token_limit"],
+                        count_tokens=count_tokens,
+                        anchor_every=anchor_every,
+                        provenance=provenance
+                    )
+                else:
+                    anchor_every = anchor_spacing(config["Step1"]["chunk_size"]) if incremental else None
+                    chunks = iter_word_bounded_chunks(
+                        page_texts,
+                        config["Step1"]["chunk_size"],
+                        anchor_every=anchor_every,
+                        provenance=provenance
+                    )
+                processed_chunks = clean_chunks(
+                    chunks,
+                    concurrency=concurrency,
+                    pack_token_budget=config["Step1"].get("pack_token_budget"),
+                    count_tokens=count_tokens,
                     client=client,
-                    text_chunk=chunk,
-                    chunk_num=chunk_num,
                     format_type=format_type,
                     system_prompt=system_prompt,
                     model_name=config["Small-Text-Model"]["model"],
                     max_tokens=config["Step1"]["max_tokens"],
-                    temperature=config["Step1"]["temperature"]
+                    temperature=config["Step1"]["temperature"],
+                    rate_limiter=rate_limiter,
+                    cache=cache,
+                    fast_path_threshold=config["Step1"].get("fast_path_threshold"),
+                    stats=stats,
+                    checkpoint=checkpoint
                 )
-                out_file.write(processed_chunk + "\n")
-                out_file.flush()
+                num_chunks = 0
+                for processed_chunk in tqdm(processed_chunks, desc="Processing chunks", disable=None):
+                    out_file.write(processed_chunk + "\n")
+                    out_file.flush()
+                    num_chunks += 1
+
+            if page_store is not None:
+                logger.info(f"Pages changed since last run: {document.pages_changed}, page texts reused: {document.pages_reused}")
+            if section_filter is not None:
+                logger.info(f"Section filter removed {section_filter.chars_removed} characters and skipped {len(section_filter.skipped_pages)} pages")
+            if stripper is not None:
+                logger.info(f"Boilerplate stripping removed {stripper.chars_removed} characters ({stripper.lines_removed} lines)")
+
+            if num_chunks == 0:
+                raise PDFExtractionError("No text extracted from PDF")
+
+            # Keep only this run's chunks and pages, so a reused output directory does not grow
+            for store in (checkpoint, page_store):
+                if store is not None:
+                    store.compact()
+        finally:
+            document.close()
+            for store in (checkpoint, page_store):
+                if store is not None:
+                    store.close()
+            if cache is not None:
+                logger.info(f"Chunk cache stats: {cache.stats()}")
+                cache.close()
 
+        logger.info(f"Processed {num_chunks} chunks: {stats.as_dict()}")
         logger.info("Processing complete")
         return str(output_file)
 
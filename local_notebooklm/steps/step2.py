@@ -1,7 +1,10 @@
-from .helpers import generate_text, wait_for_next_step, FormatType, LengthType, StyleType
-from .prompts import map_step2_system_prompt
+from .helpers import generate_text, FormatType, LengthType, StyleType, split_by_token_budget, estimate_tokens, token_counter_for, RateLimiter, TokenUsage, get_rate_limiter
+from .stitch import StitchStats, stitch_text
+from .transcript import TranscriptWriter
+from .prompts import map_step2_system_prompt, step2_map_prompt, step2_summary_prompt
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, Optional
-import logging, pickle, time
+import logging
 from pathlib import Path
 from tqdm import tqdm
 
@@ -38,6 +41,76 @@ def read_input_file(filename: str) -> str:
     except IOError as e:
         raise FileReadError(f"Could not read file '{filename}': {str(e)}")
 
+class RollingContext:
+    """Bounded state passed between step2 continuation calls.
+
+    Holds a summary of the topics covered so far, capped at `summary_token_cap`
+    tokens, and the last `tail_lines` lines of the transcript, capped at
+    `tail_token_cap` tokens. The prompt for each continuation call therefore
+    stays the same size however long the transcript gets.
+    """
+
+    def __init__(
+        self,
+        format_type,
+        summary_token_cap=300,
+        tail_lines=4,
+        tail_token_cap=300,
+        count_tokens=estimate_tokens
+    ):
+        self.format_type = format_type
+        self.summary_token_cap = summary_token_cap
+        self.tail_lines = tail_lines
+        self.tail_token_cap = tail_token_cap
+        self.count_tokens = count_tokens
+        self.summary = ""
+        self.tail = ""
+
+    def update(
+        self,
+        part,
+        client,
+        model_name,
+        temperature,
+        rate_limiter: Optional[RateLimiter] = None,
+        usage: Optional[TokenUsage] = None
+    ):
+        lines = [line for line in part.strip().splitlines() if line.strip()]
+        tail = "\n".join(lines[-self.tail_lines:]) if self.tail_lines else ""
+        if tail and self.count_tokens(tail) > self.tail_token_cap:
+            tail = split_by_token_budget(tail, self.tail_token_cap, 0, self.count_tokens)[-1]
+        self.tail = tail
+
+        if self.summary_token_cap <= 0:
+            return
+        conversation = [
+            {"role": "system", "content": step2_summary_prompt.format(
+                format_type=self.format_type, max_words=int(self.summary_token_cap * 0.75)
+            )},
+            {"role": "user", "content": f"Current list:\n{self.summary or '(empty)'}\n\nNewest part:\n{part}"},
+        ]
+        summary = generate_text(
+            client=client,
+            model=model_name,
+            messages=conversation,
+            max_tokens=self.summary_token_cap,
+            temperature=temperature,
+            rate_limiter=rate_limiter,
+            cache_prompt=True,
+            usage=usage,
+        ).strip()
+        if self.count_tokens(summary) > self.summary_token_cap:
+            summary = split_by_token_budget(summary, self.summary_token_cap, 0, self.count_tokens)[0]
+        self.summary = summary
+
+    def render(self) -> str:
+        sections = []
+        if self.summary:
+            sections.append(f"Topics already covered (do not repeat them):\n{self.summary}")
+        if self.tail:
+            sections.append(f"The transcript so far ends with:\n{self.tail}")
+        return "\n\n".join(sections)
+
 def generate_transcript(
     client,
     model_name,
@@ -50,27 +123,23 @@ def generate_transcript(
     max_tokens,
     temperature,
     chunk_token_limit,
-    overlap_percent
+    overlap_percent,
+    count_tokens=estimate_tokens,
+    on_delta=None,
+    metrics=None,
+    rate_limiter: Optional[RateLimiter] = None,
+    usage: Optional[TokenUsage] = None,
+    summary_token_cap=300,
+    context_lines=4,
+    stitch_stats: Optional[StitchStats] = None,
+    transcript_writer: Optional[TranscriptWriter] = None
 ) -> str:
     try:
-        wait_for_next_step()
-        
-        # More conservative token estimation (3.5 chars per token)
-        estimated_tokens = len(input_text) // 3.5
+        input_tokens = count_tokens(input_text)
         
-        # If input is likely too long, split it into chunks
-        if estimated_tokens > chunk_token_limit:
-            # Convert token count to character count for chunking
-            chunk_size = int(chunk_token_limit * 3.5)
-            overlap_size = int(chunk_size * overlap_percent / 100)
-            
-            # Create chunks with overlap
-            chunks = []
-            start = 0
-            while start < len(input_text):
-                end = min(start + chunk_size, len(input_text))
-                chunks.append(input_text[start:end])
-                start = end - overlap_size if end < len(input_text) else end
+        # If input is too long, split it into chunks packed up to the token budget
+        if input_tokens > chunk_token_limit:
+            chunks = split_by_token_budget(input_text, chunk_token_limit, overlap_percent, count_tokens)
             
             logger.info(f"Input split into {len(chunks)} chunks with {overlap_percent}% overlap (chunk_token_limit: {chunk_token_limit})")
             
@@ -88,17 +157,41 @@ def generate_transcript(
                 messages=conversation,
                 max_tokens=max_tokens,
                 temperature=temperature,
+                on_delta=on_delta,
+                metrics=metrics,
+                rate_limiter=rate_limiter,
+                usage=usage,
             )
+            if transcript_writer is not None:
+                transcript_writer.append_text(transcript, chunk=0)
             
+            context = RollingContext(
+                format_type,
+                summary_token_cap=summary_token_cap,
+                tail_lines=context_lines,
+                count_tokens=count_tokens
+            )
+            last_part = transcript
+
             # Process remaining chunks with tqdm progress bar
             for i, chunk in tqdm(enumerate(chunks[1:], 2), total=len(chunks)-1, desc="Processing chunks"):
-                # Add delay between API calls
-                time.sleep(3)
+                if on_delta is not None:
+                    on_delta("\n")
+
+                # Only the bounded rolling context is carried over, never the whole transcript so far
+                context.update(
+                    last_part,
+                    client=client,
+                    model_name=model_name,
+                    temperature=temperature,
+                    rate_limiter=rate_limiter,
+                    usage=usage
+                )
                 
                 # Very minimal prompt to save tokens
                 conversation = [
-                    {"role": "system", "content": f"Continue the {format_type} transcript without repeating introductions."},
-                    {"role": "user", "content": f"Continue the transcript with part {i}/{len(chunks)}: {chunk}"}
+                    {"role": "system", "content": f"Continue the {format_type} transcript without repeating introductions or topics already covered."},
+                    {"role": "user", "content": f"{context.render()}\n\nContinue the transcript with part {i}/{len(chunks)}: {chunk}".lstrip()}
                 ]
                 
                 next_part = generate_text(
@@ -107,9 +200,19 @@ def generate_transcript(
                     messages=conversation,
                     max_tokens=max_tokens,
                     temperature=temperature,
+                    on_delta=on_delta,
+                    metrics=metrics,
+                    rate_limiter=rate_limiter,
+                    cache_prompt=True,
+                    usage=usage,
                 )
                 
+                # Chunk inputs overlap, so drop the start of this part where it repeats the previous one
+                next_part = stitch_text(transcript, next_part, stats=stitch_stats)
                 transcript += "\n" + next_part
+                last_part = next_part
+                if transcript_writer is not None:
+                    transcript_writer.append_text(next_part, chunk=i - 1)
             
             return transcript
         else:
@@ -129,11 +232,122 @@ def generate_transcript(
                 messages=conversation,
                 max_tokens=max_tokens,
                 temperature=temperature,
+                on_delta=on_delta,
+                metrics=metrics,
+                rate_limiter=rate_limiter,
+                usage=usage,
             )
 
     except Exception as e:
         raise TranscriptGenerationError(f"Failed to generate transcript: {str(e)}")
 
+def outline_chunk(
+    client,
+    model_name,
+    chunk,
+    part,
+    total,
+    format_type,
+    preference_text,
+    max_tokens,
+    temperature,
+    rate_limiter: Optional[RateLimiter] = None,
+    usage: Optional[TokenUsage] = None
+) -> str:
+    # The system prompt is identical for every part so providers can reuse its cached prefix.
+    conversation = [
+        {"role": "system", "content": step2_map_prompt.format(
+            format_type=format_type, preference_text=preference_text
+        )},
+        {"role": "user", "content": f"Part {part} of {total}:\n\n{chunk}"},
+    ]
+    return generate_text(
+        client=client,
+        model=model_name,
+        messages=conversation,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        rate_limiter=rate_limiter,
+        cache_prompt=True,
+        usage=usage,
+    )
+
+def generate_transcript_map_reduce(
+    client,
+    model_name,
+    input_text,
+    length,
+    style,
+    format_type,
+    preference_text,
+    system_prompt,
+    max_tokens,
+    temperature,
+    chunk_token_limit,
+    count_tokens=estimate_tokens,
+    map_max_tokens=1024,
+    concurrency=4,
+    rate_limiter: Optional[RateLimiter] = None,
+    max_rounds=3,
+    on_delta=None,
+    metrics=None,
+    usage: Optional[TokenUsage] = None
+) -> str:
+    """Outline the chunks in parallel, then write the whole transcript from the combined outline.
+
+    If the combined outline is still over `chunk_token_limit`, it is outlined again
+    (up to `max_rounds` times) before the final reduce call.
+    """
+    try:
+        notes = input_text
+        for round_num in range(1, max_rounds + 1):
+            if count_tokens(notes) <= chunk_token_limit:
+                break
+            chunks = split_by_token_budget(notes, chunk_token_limit, 0, count_tokens)
+            logger.info(f"Map round {round_num}: outlining {len(chunks)} chunks with concurrency {concurrency}")
+
+            with ThreadPoolExecutor(max_workers=max(1, int(concurrency))) as executor:
+                outlines = list(tqdm(executor.map(
+                    lambda item: outline_chunk(
+                        client=client,
+                        model_name=model_name,
+                        chunk=item[1],
+                        part=item[0],
+                        total=len(chunks),
+                        format_type=format_type,
+                        preference_text=preference_text,
+                        max_tokens=map_max_tokens,
+                        temperature=temperature,
+                        rate_limiter=rate_limiter,
+                        usage=usage,
+                    ),
+                    enumerate(chunks, 1)
+                ), total=len(chunks), desc="Outlining chunks"))
+
+            notes = "\n\n".join(f"Part {i}/{len(outlines)}:\n{outline}" for i, outline in enumerate(outlines, 1))
+
+        if system_prompt == None:
+            system_prompt = map_step2_system_prompt(length=length, style=style, format_type=format_type, preference_text=preference_text)
+
+        conversation = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Here are ordered notes covering the whole document:\n\n{notes}"},
+        ]
+        return generate_text(
+            client=client,
+            model=model_name,
+            messages=conversation,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            on_delta=on_delta,
+            metrics=metrics,
+            rate_limiter=rate_limiter,
+            usage=usage,
+        )
+
+    except Exception as e:
+        raise TranscriptGenerationError(f"Failed to generate map-reduce transcript: {str(e)}")
+
 def step2(
     client: Any = None,
     config: Optional[Dict[str, Any]] = None,
@@ -152,30 +366,94 @@ def step2(
         logger.info(f"Reading input file: {input_file}")
         input_text = read_input_file(input_file)
         
+        output_file = output_dir / 'data'
+        transcript_writer = TranscriptWriter(f"{output_file}.jsonl", step="step2", format_type=format_type)
+        metrics = None
+        partial_file = None
+        on_delta = None
+        rate_limiter = get_rate_limiter(config["Big-Text-Model"]["provider"])
+        usage = TokenUsage()
+        stitch_stats = StitchStats()
+        if config["Step2"].get("stream", True):
+            metrics = []
+            # Deltas are appended to data.txt as they arrive so later stages and the UI can follow along.
+            partial_file = open(f"{output_file}.txt", 'w', encoding='utf-8')
+            def on_delta(delta):
+                partial_file.write(delta)
+                partial_file.flush()
+
         logger.info(f"Generating {length} {style} transcript...")
-        transcript = generate_transcript(
-            client=client,
-            model_name=config["Big-Text-Model"]["model"],
-            input_text=input_text,
-            format_type=format_type,
-            length=length,
-            style=style,
-            system_prompt=system_prompt,
-            preference_text=preference_text,
-            max_tokens=config["Step2"]["max_tokens"],
-            temperature=config["Step2"]["temperature"],
-            chunk_token_limit=config["Step2"].get("chunk_token_limit", 2000),
-            overlap_percent=config["Step2"].get("overlap_percent", 10)
-        )
+        try:
+            if config["Step2"].get("mode", "sequential") == "map_reduce":
+                transcript = generate_transcript_map_reduce(
+                    client=client,
+                    model_name=config["Big-Text-Model"]["model"],
+                    input_text=input_text,
+                    format_type=format_type,
+                    length=length,
+                    style=style,
+                    system_prompt=system_prompt,
+                    preference_text=preference_text,
+                    max_tokens=config["Step2"]["max_tokens"],
+                    temperature=config["Step2"]["temperature"],
+                    chunk_token_limit=config["Step2"].get("chunk_token_limit", 2000),
+                    count_tokens=token_counter_for(config["Big-Text-Model"]),
+                    map_max_tokens=config["Step2"].get("map_max_tokens", 1024),
+                    concurrency=config["Step2"].get("concurrency", 4),
+                    rate_limiter=rate_limiter,
+                    on_delta=on_delta,
+                    metrics=metrics,
+                    usage=usage
+                )
+            else:
+                transcript = generate_transcript(
+                    client=client,
+                    model_name=config["Big-Text-Model"]["model"],
+                    input_text=input_text,
+                    format_type=format_type,
+                    length=length,
+                    style=style,
+                    system_prompt=system_prompt,
+                    preference_text=preference_text,
+                    max_tokens=config["Step2"]["max_tokens"],
+                    temperature=config["Step2"]["temperature"],
+                    chunk_token_limit=config["Step2"].get("chunk_token_limit", 2000),
+                    overlap_percent=config["Step2"].get("overlap_percent", 10),
+                    count_tokens=token_counter_for(config["Big-Text-Model"]),
+                    summary_token_cap=config["Step2"].get("summary_token_cap", 300),
+                    context_lines=config["Step2"].get("context_lines", 4),
+                    stitch_stats=stitch_stats,
+                    transcript_writer=transcript_writer,
+                    on_delta=on_delta,
+                    metrics=metrics,
+                    rate_limiter=rate_limiter,
+                    usage=usage
+                )
+            if transcript_writer.turns == 0:
+                # Single-call and map-reduce transcripts come back whole
+                transcript_writer.append_text(transcript)
+        finally:
+            transcript_writer.close()
+            if partial_file is not None:
+                partial_file.close()
+
+        if metrics:
+            timed = [m["ttft"] for m in metrics if m["ttft"] is not None]
+            avg_ttft = sum(timed) / len(timed) if timed else 0.0
+            avg_rate = sum(m["tokens_per_sec"] for m in metrics) / len(metrics)
+            logger.info(f"Streamed {len(metrics)} calls: average TTFT {avg_ttft:.2f}s, average {avg_rate:.1f} tokens/sec")
+
+        if stitch_stats.seams:
+            logger.info(f"Removed {stitch_stats.duplicate_chars} duplicate characters ({stitch_stats.duplicate_turns} lines) at {stitch_stats.seams} chunk seams")
+
+        if usage.prompt_tokens:
+            logger.info(f"Prompt cache: {usage.cached_tokens} of {usage.prompt_tokens} prompt tokens served from cache over {usage.calls} calls")
 
-        output_file = output_dir / 'data'
-        with open(f"{output_file}.pkl", 'wb') as file:
-            pickle.dump(transcript, file)
         with open(f"{output_file}.txt", 'w') as file:
             file.write(transcript)
 
-        logger.info(f"Transcript saved to: {output_file}")
-        return str(input_file), str(f"{output_file}.pkl")
+        logger.info(f"Transcript saved to: {output_file}.jsonl ({transcript_writer.turns} turns)")
+        return str(input_file), str(f"{output_file}.jsonl")
 
     except (FileReadError, TranscriptGenerationError, InvalidParameterError) as e:
         logger.error(f"Transcript generation failed: {str(e)}")
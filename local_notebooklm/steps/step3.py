@@ -1,9 +1,12 @@
-from .helpers import generate_text, FormatType, wait_for_next_step
-from .prompts import map_step3_system_prompt
-from typing import Dict, Any, Optional
+from .helpers import generate_text, FormatType, SINGLE_SPEAKER_FORMATS, THREE_SPEAKER_FORMATS, FOUR_SPEAKER_FORMATS, FIVE_SPEAKER_FORMATS, SENTENCE_END, split_by_turns, estimate_tokens, token_counter_for, RateLimiter, TokenUsage, get_rate_limiter, is_rate_limit_error, is_request_rejected_error, Counters
+from .stitch import StitchStats, stitch_turns
+from .transcript import Transcript, TranscriptFormatError, TranscriptWriter, read_transcript_text
+from .prompts import map_step3_system_prompt, step3_handoff_prompt, step3_seam_prompt
+from typing import Dict, Any, List, Optional, Tuple
 from ast import literal_eval
 from pathlib import Path
-import logging, pickle
+from concurrent.futures import ThreadPoolExecutor
+import json, logging, re
 from tqdm import tqdm
 
 
@@ -18,16 +21,448 @@ class TranscriptGenerationError(TranscriptError):
 class InvalidParameterError(TranscriptError):
     pass
 
-def read_pickle_file(filename: str) -> str:
+def read_transcript_file(filename: str) -> str:
     try:
-        with open(filename, 'rb') as file:
-            content = pickle.load(file)
-        return content
+        return read_transcript_text(filename)
     except FileNotFoundError:
         raise FileReadError(f"File '{filename}' not found")
-    except Exception as e:
-        raise FileReadError(f"Failed to read pickle file: {str(e)}")
-    
+    except (TranscriptFormatError, ValueError) as e:
+        raise FileReadError(f"Failed to read transcript file: {str(e)}")
+
+DIALOGUE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "dialogue": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "speaker": {"type": "string"},
+                    "text": {"type": "string"}
+                },
+                "required": ["speaker", "text"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["dialogue"],
+    "additionalProperties": False
+}
+
+STRUCTURED_FORMAT_INSTRUCTION = """
+Return the dialogue as a JSON object of the form {"dialogue": [{"speaker": "Speaker 1", "text": "..."}, ...]}, one entry per turn, in order.
+"""
+
+TUPLE_FORMAT_INSTRUCTION = """
+            CRITICALLY IMPORTANT: Your output MUST be in the exact format of a Python list of tuples, where each tuple contains a speaker name and their dialogue. 
+            Example format: [('Speaker1', 'This is what Speaker1 says.'), ('Speaker2', 'This is Speaker2's response.')]
+            Ensure all quotes are properly escaped and the entire response must be valid Python syntax that can be parsed by literal_eval().
+            """
+
+GOODBYE_PHRASES = ["goodbye", "bye", "farewell", "until next time", "see you", 
+                   "thanks for listening", "that's all", "wrapping up", 
+                   "concluding", "end of", "final thoughts"]
+
+CODE_FENCE = re.compile(r'^```[\w-]*\s*|\s*```$')
+TUPLE_TURN = re.compile(r'\(\s*([\'"])(.+?)\1\s*,\s*([\'"])(.*?)\3\s*\)(?=\s*(?:,|\]|$))', re.DOTALL)
+OBJECT_TURN = re.compile(r'\{\s*"speaker"\s*:\s*"((?:[^"\\]|\\.)*)"\s*,\s*"text"\s*:\s*"((?:[^"\\]|\\.)*)"\s*\}', re.DOTALL)
+LABELED_LINE = re.compile(r'^\s*\**(Speaker\s*\d+)\**\s*:\s*(.+)$', re.MULTILINE)
+CLEAN_TURN = re.compile(r'^Speaker ([1-9]\d*): (\S.*)$')
+MARKUP = re.compile(r'```|\*\*|^\s*#|^\s*[-*\u2022]\s|\[[^\]]*\]|<[^>]+>|[{}]', re.MULTILINE)
+# A short "Title:" / "Narrator:" style prefix, and the punctuation a spoken paragraph ends with
+LABEL_PREFIX = re.compile(r"^[A-Z][\w'-]*(?: [\w'-]+){0,2}:\s")
+SENTENCE_CLOSE = re.compile(r'[.!?\u2026]["\'\u201d\u2019)]*$')
+
+class DialogueStats(Counters):
+    """Thread-safe counters for how step3 model outputs were turned into dialogue turns."""
+
+    FIELDS = ("structured_calls", "local_repairs", "repair_calls")
+
+    def __init__(self, structured: bool = True):
+        super().__init__()
+        self.structured = structured
+
+def _as_turns(data) -> Optional[List[Tuple[str, str]]]:
+    if isinstance(data, dict):
+        data = data.get("dialogue", data.get("turns"))
+    if not isinstance(data, (list, tuple)) or not data:
+        return None
+    turns = []
+    for item in data:
+        if isinstance(item, dict) and "speaker" in item and "text" in item:
+            turns.append((str(item["speaker"]), str(item["text"])))
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            turns.append((str(item[0]), str(item[1])))
+        else:
+            return None
+    return turns
+
+def parse_dialogue(output: str) -> Tuple[Optional[List[Tuple[str, str]]], bool]:
+    """Parse model output into (speaker, text) turns without calling the model again.
+
+    Tries JSON, then a Python literal, then extracts tuple, JSON-object or
+    `Speaker N:` turns with regular expressions. Returns the turns (or None) and
+    whether a tolerant fallback was needed.
+    """
+    text = CODE_FENCE.sub("", (output or "").strip())
+    try:
+        turns = _as_turns(json.loads(text))
+        if turns:
+            return turns, False
+    except ValueError:
+        pass
+
+    # Python list of tuples, as the prompts used to ask for
+    cleaned = text.replace("\u2018", "'").replace("\u2019", "'").replace("\u201c", "\"").replace("\u201d", "\"").replace("…", "...")
+    for candidate in (text, cleaned):
+        try:
+            turns = _as_turns(literal_eval(candidate))
+            if turns:
+                return turns, candidate is not text
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            pass
+
+    turns = [(speaker, body.replace("\\'", "'").replace('\\"', '"')) for _, speaker, _, body in TUPLE_TURN.findall(cleaned)]
+    if turns:
+        return turns, True
+    turns = [(json.loads(f'"{speaker}"'), json.loads(f'"{body}"')) for speaker, body in OBJECT_TURN.findall(text)]
+    if turns:
+        return turns, True
+    turns = [(speaker.strip(), body.strip()) for speaker, body in LABELED_LINE.findall(text)]
+    if turns:
+        return turns, True
+    return None, True
+
+def speaker_count(format_type: str) -> int:
+    if format_type in SINGLE_SPEAKER_FORMATS:
+        return 1
+    if format_type in THREE_SPEAKER_FORMATS:
+        return 3
+    if format_type in FOUR_SPEAKER_FORMATS:
+        return 4
+    if format_type in FIVE_SPEAKER_FORMATS:
+        return 5
+    return 2
+
+def _monologue_turns(paragraphs: List[str], max_chars: int) -> List[Tuple[str, str]]:
+    """Group each paragraph's sentences into Speaker 1 turns of up to `max_chars` characters."""
+    turns = []
+    for paragraph in paragraphs:
+        current = ""
+        for sentence in SENTENCE_END.split(paragraph):
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                turns.append(("Speaker 1", current))
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            turns.append(("Speaker 1", current))
+    return turns
+
+def convert_transcript(text: str, format_type: str, language: str, max_chars: int = 500) -> Tuple[Optional[List[Tuple[str, str]]], str]:
+    """Map an already TTS-ready step2 transcript straight to turns, without the model.
+
+    Accepts clean `Speaker N: text` lines with the format's speaker count, or, for
+    single-speaker formats, unlabeled paragraphs or `Speaker 1:` lines, which are
+    split into sentence groups. Other `Label:` prefixes and lines that do not end
+    like a sentence (titles, headings) send the transcript to the model. Returns the turns (or None) and the reason the
+    transcript was rejected, so the model rewrite runs only when it is needed.
+    """
+    if language.lower() != "english":
+        return None, f"translation to {language} needs the model"
+    if MARKUP.search(text):
+        return None, "markup or stage directions present"
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines:
+        return None, "empty transcript"
+
+    expected = speaker_count(format_type)
+    matches = [CLEAN_TURN.match(line) for line in lines]
+    if expected == 1:
+        if any(match and match.group(1) != "1" for match in matches):
+            return None, "more than one speaker in a single-speaker format"
+        paragraphs = [match.group(2) if match else line for match, line in zip(matches, lines)]
+        if any(not match and LABEL_PREFIX.match(line) for match, line in zip(matches, lines)):
+            return None, "lines with a label other than Speaker 1"
+        if not all(SENTENCE_CLOSE.search(paragraph) for paragraph in paragraphs):
+            return None, "title or heading lines without closing punctuation"
+        return _monologue_turns(paragraphs, max_chars), ""
+
+    if not all(matches):
+        return None, "lines without a Speaker N: label"
+    speakers = {int(match.group(1)) for match in matches}
+    if max(speakers) > expected:
+        return None, f"more than {expected} speakers"
+    if len(speakers) < 2:
+        return None, "only one speaker in a multi-speaker format"
+    return [(f"Speaker {match.group(1)}", match.group(2)) for match in matches], ""
+
+# Opening quote -> the quotes that may close it
+QUOTE_PAIRS = {
+    '"': '"',
+    "\u201c": "\u201d",
+    "\u201d": "\u201d",
+    "'": "'\u2019",
+    "\u2018": "'\u2019",
+    "\u2019": "'\u2019",
+}
+STRING_END = ",)]}:"
+ESCAPES = {"n": "\n", "t": "\t", "r": "\r"}
+
+class DialogueStreamParser:
+    """Incremental parser that turns streamed model output into (speaker, text) turns.
+
+    Feed it deltas as they arrive; each call returns the turns closed so far.
+    Every character is looked at once. Python tuples and `{"speaker", "text"}`
+    objects are both recognized. A string is only closed by a quote matching the
+    one that opened it (smart quotes included), and only when the next non-space
+    character is one of `,)]}:`, so unescaped apostrophes survive. With
+    `json_mode`, as for structured output, only `"` delimits strings. Anything
+    outside a turn, such as code fences or trailing remarks, is ignored.
+    """
+
+    SEEK, FIELDS, STRING, ESCAPE, UNICODE, MAYBE_END = range(6)
+
+    def __init__(self, json_mode: bool = False):
+        self.json_mode = json_mode
+        self.turns = []
+        self._state = self.SEEK
+        self._fields = []
+        self._current = []
+        self._quotes = ""
+        self._pending = ""
+        self._unicode = ""
+        self._parts = []
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return "".join(self._parts)
+
+    @property
+    def incomplete(self) -> bool:
+        """True if the output ended inside a string or an unclosed turn."""
+        return self._state != self.SEEK
+
+    def feed(self, delta: str) -> List[Tuple[str, str]]:
+        self._parts.append(delta)
+        closed = []
+        for char in delta:
+            self._step(char, closed)
+        self.turns.extend(closed)
+        return closed
+
+    def _step(self, char: str, closed: list):
+        state = self._state
+        if state == self.SEEK:
+            if char in "({":
+                self._start_turn()
+        elif state == self.FIELDS:
+            if char in "({":
+                # Nested container such as {"dialogue": [{...}]}: the inner one is the turn
+                self._start_turn()
+            elif char in ")}":
+                self._close_turn(closed)
+            elif char == '"' or (char in QUOTE_PAIRS and not self.json_mode):
+                self._quotes = QUOTE_PAIRS[char]
+                self._current = []
+                self._state = self.STRING
+        elif state == self.STRING:
+            if char == "\\":
+                self._state = self.ESCAPE
+            elif char in self._quotes:
+                if self.json_mode:
+                    # Quotes inside JSON strings are always escaped
+                    self._fields.append("".join(self._current))
+                    self._state = self.FIELDS
+                else:
+                    self._pending = char
+                    self._state = self.MAYBE_END
+            else:
+                self._current.append(char)
+        elif state == self.ESCAPE:
+            if char == "u":
+                self._unicode = ""
+                self._state = self.UNICODE
+            else:
+                self._current.append(ESCAPES.get(char, char))
+                self._state = self.STRING
+        elif state == self.UNICODE:
+            self._unicode += char
+            if len(self._unicode) == 4:
+                try:
+                    self._current.append(chr(int(self._unicode, 16)))
+                except ValueError:
+                    self._current.append("\\u" + self._unicode)
+                self._state = self.STRING
+        elif state == self.MAYBE_END:
+            if char.isspace():
+                self._pending += char
+            elif char in STRING_END:
+                self._fields.append("".join(self._current))
+                self._state = self.FIELDS
+                self._step(char, closed)
+            else:
+                # The quote was part of the text, e.g. an unescaped apostrophe
+                self._current.append(self._pending)
+                self._state = self.STRING
+                self._step(char, closed)
+
+    def _start_turn(self):
+        self._fields = []
+        self._state = self.FIELDS
+
+    def _close_turn(self, closed: list):
+        fields = self._fields
+        self._fields = []
+        self._state = self.SEEK
+        if len(fields) == 2:
+            closed.append((fields[0], fields[1]))
+        elif len(fields) == 4:
+            record = dict(zip(fields[0::2], fields[1::2]))
+            if "speaker" in record and "text" in record:
+                closed.append((record["speaker"], record["text"]))
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Finish the stream and return all turns.
+
+        The whole output is parsed again with `parse_dialogue`, and that result is
+        used instead if it finds more turns or the stream ended mid-string or
+        mid-turn.
+        """
+        full, _ = parse_dialogue(self.text)
+        if full and (self.incomplete or len(full) > len(self.turns)):
+            return full
+        return self.turns
+
+def request_dialogue(
+    client,
+    model_name,
+    conversation,
+    max_tokens,
+    temperature,
+    rate_limiter: Optional[RateLimiter] = None,
+    usage: Optional[TokenUsage] = None,
+    stats: Optional[DialogueStats] = None,
+    cache_prompt: bool = False,
+    stream: bool = False,
+    transcript_writer: Optional[TranscriptWriter] = None,
+    format_instruction: str = ""
+) -> List[Tuple[str, str]]:
+    """Ask for dialogue turns, with structured output when enabled and supported.
+
+    `format_instruction` is appended to the system message of plain-text requests,
+    including the one made after the provider rejects structured output.
+
+    With `stream`, the response is parsed by `DialogueStreamParser` while it is
+    generated and each turn is appended to `transcript_writer` as soon as it is
+    complete. Once the response ends it is checked with `DialogueStreamParser.close`;
+    if the final turns differ from those already written, the writer is rewound
+    to where this call started and the final turns are written instead.
+    Unparseable output first goes through `parse_dialogue`; only if that fails is
+    one repair call made to the model.
+    """
+    stats = stats if stats is not None else DialogueStats(structured=False)
+    parser = None
+    on_delta = None
+    start = transcript_writer.turns if transcript_writer is not None else 0
+    emitted = []
+
+    def reset_parser(json_mode):
+        nonlocal parser, on_delta
+        if emitted:
+            transcript_writer.truncate(start)
+            emitted.clear()
+        if not stream:
+            return
+        parser = DialogueStreamParser(json_mode=json_mode)
+        def on_delta(delta):
+            for speaker, text in parser.feed(delta):
+                if transcript_writer is not None:
+                    transcript_writer.append(speaker, text)
+                    emitted.append((speaker, text))
+
+    def finish(turns):
+        if transcript_writer is not None:
+            if list(turns[:len(emitted)]) != emitted:
+                logger.warning("Streamed dialogue turns did not match the final parse, rewriting them")
+                transcript_writer.truncate(start)
+                emitted.clear()
+            transcript_writer.extend(turns[len(emitted):])
+        return turns
+
+    output = None
+    if stats.structured:
+        reset_parser(json_mode=True)
+        try:
+            output = generate_text(
+                client=client,
+                model=model_name,
+                messages=[
+                    {**conversation[0], "content": conversation[0]["content"] + "\n" + STRUCTURED_FORMAT_INSTRUCTION},
+                    *conversation[1:]
+                ],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                rate_limiter=rate_limiter,
+                cache_prompt=cache_prompt,
+                usage=usage,
+                json_schema=DIALOGUE_SCHEMA,
+                schema_name="dialogue",
+                on_delta=on_delta,
+            )
+            stats.record("structured_calls")
+        except Exception as e:
+            if not is_request_rejected_error(e):
+                raise
+            # The provider or server does not support structured output; use plain text from now on
+            logger.warning(f"Structured output unavailable, falling back to text output: {str(e)}")
+            stats.structured = False
+
+    if output is None:
+        reset_parser(json_mode=False)
+        if format_instruction:
+            conversation = [{**conversation[0], "content": conversation[0]["content"] + "\n" + format_instruction}, *conversation[1:]]
+        output = generate_text(
+            client=client,
+            model=model_name,
+            messages=conversation,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            rate_limiter=rate_limiter,
+            cache_prompt=cache_prompt,
+            usage=usage,
+            on_delta=on_delta,
+        )
+
+    if parser and parser.turns:
+        return finish(parser.close())
+
+    turns, repaired = parse_dialogue(output)
+    if turns is not None:
+        if repaired:
+            stats.record("local_repairs")
+        return finish(turns)
+
+    logger.warning(f"Could not parse dialogue locally, asking the model to fix the format. Raw output (first 300 chars): {(output or '')[:300]}...")
+    stats.record("repair_calls")
+    fixed = generate_text(
+        client=client,
+        model=model_name,
+        messages=[
+            {"role": "system", "content": "Convert the following text into valid Python syntax as a list of tuples with format: [('Speaker1', 'Text1'), ('Speaker2', 'Text2'), ...]. Return ONLY the Python list, nothing else, no other text."},
+            {"role": "user", "content": output or ""}
+        ],
+        max_tokens=max_tokens,
+        temperature=0.3,
+        rate_limiter=rate_limiter,
+        usage=usage,
+    )
+    turns, _ = parse_dialogue(fixed)
+    if turns is None:
+        raise TranscriptGenerationError(f"Failed to parse dialogue after correction attempt. Raw output (first 300 chars): {fixed[:300]}...")
+    return finish(turns)
+
 def generate_rewritten_transcript(
     client,
     model_name,
@@ -36,10 +471,15 @@ def generate_rewritten_transcript(
     max_tokens,
     temperature,
     format_type,
-    language
-) -> str:
+    language,
+    rate_limiter: Optional[RateLimiter] = None,
+    usage: Optional[TokenUsage] = None,
+    dialogue_stats: Optional[DialogueStats] = None,
+    stream: bool = False,
+    transcript_writer: Optional[TranscriptWriter] = None
+) -> List[Tuple[str, str]]:
+    """Rewrite the transcript in one call; with `transcript_writer`, each turn is written as soon as it is parsed."""
     try:
-        wait_for_next_step()
         if system_prompt == None:
             system_prompt = map_step3_system_prompt(format_type=format_type, language=language)
         else:
@@ -48,18 +488,67 @@ def generate_rewritten_transcript(
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": input_text},
         ]
-        out = generate_text(
+        return request_dialogue(
             client=client,
-            model=model_name,
-            messages=conversation,
+            model_name=model_name,
+            conversation=conversation,
             max_tokens=max_tokens,
-            temperature=temperature
+            temperature=temperature,
+            rate_limiter=rate_limiter,
+            usage=usage,
+            stats=dialogue_stats,
+            stream=stream,
+            transcript_writer=transcript_writer
         )
-        return out
 
     except Exception as e:
         raise TranscriptGenerationError(f"Failed to generate transcript: {str(e)}")
 
+def stitch_dialogue(previous, following, stats: Optional[StitchStats] = None) -> list:
+    """Drop the turns at the start of `following` that repeat the end of `previous`, which overlap between chunks produces."""
+    return stitch_turns(
+        previous,
+        following,
+        text_of=lambda turn: turn[1],
+        with_text=lambda turn, text: (turn[0], text),
+        stats=stats
+    )
+
+def filter_goodbyes(turns) -> List[Tuple[str, str]]:
+    """Cut goodbye-like phrases from turns of a chunk that is not the last one."""
+    filtered = []
+    for speaker, text in turns:
+        # Find if any goodbye phrase exists in the text
+        found_phrase = None
+        for phrase in GOODBYE_PHRASES:
+            if phrase in text.lower():
+                found_phrase = phrase
+                break
+        
+        if not found_phrase:
+            filtered.append((speaker, text))
+        else:
+            # Replace with a continuation prompt instead
+            modified_text = text.lower().split(found_phrase)[0]
+            filtered.append((speaker, modified_text + "let's continue our discussion."))
+    return filtered
+
+def chunk_system_prompt(system_prompt, format_type, language, is_final_chunk) -> str:
+    # The output format is added by request_dialogue: TUPLE_FORMAT_INSTRUCTION, or the JSON schema with structured output
+    if system_prompt == None:
+        prompt = map_step3_system_prompt(format_type=format_type, language=language)
+    else:
+        prompt = system_prompt
+        
+    if not is_final_chunk:
+        prompt += "\n\nIMPORTANT: Since this is not the final part of the conversation, DO NOT include any goodbyes, conclusions, or wrap-ups. The conversation should continue naturally."
+    return prompt
+
+def position_context(is_final_chunk) -> str:
+    if not is_final_chunk:
+        return "\n\nIMPORTANT: DO NOT conclude the conversation or say goodbyes. This is the middle of the conversation, not the end."
+    return "\n\nThis is the final part of the conversation. You may conclude naturally if appropriate."
+
 def generate_rewritten_transcript_with_overlap(
     client,
     model_name,
@@ -69,25 +558,26 @@ def generate_rewritten_transcript_with_overlap(
     format_type,
     system_prompt,
     language,
-    chunk_size=8000,
-    overlap_percent=20
-) -> str:
-    """Generate transcript in chunks with overlap for seamless continuation."""
+    chunk_token_limit=2000,
+    overlap_turns=0,
+    count_tokens=estimate_tokens,
+    rate_limiter: Optional[RateLimiter] = None,
+    usage: Optional[TokenUsage] = None,
+    stitch_stats: Optional[StitchStats] = None,
+    dialogue_stats: Optional[DialogueStats] = None,
+    stream: bool = False,
+    transcript_writer: Optional[TranscriptWriter] = None
+) -> List[Tuple[str, str]]:
+    """Generate transcript in chunks with overlap for seamless continuation.
+
+    If `transcript_writer` is given, the turns kept from each chunk are written,
+    tagged with the chunk index, as soon as that chunk is stitched.
+    """
     try:
-        wait_for_next_step()
-        
-        # Calculate overlap size in characters
-        overlap_size = int(chunk_size * (overlap_percent / 100))
-        
-        # Split the input text into chunks with overlap
-        chunks = []
-        start = 0
-        while start < len(input_text):
-            end = min(start + chunk_size, len(input_text))
-            chunks.append(input_text[start:end])
-            start = end - overlap_size if end < len(input_text) else end
+        # Split the input text into chunks of whole turns packed up to the token budget
+        chunks = split_by_turns(input_text, chunk_token_limit, overlap_turns, count_tokens)
         
-        logger.info(f"Processing transcript in {len(chunks)} chunks with {overlap_percent}% overlap")
+        logger.info(f"Processing transcript in {len(chunks)} chunks with {overlap_turns} overlapping turns")
         
         # Process each chunk and combine results
         combined_transcript = []
@@ -103,145 +593,224 @@ def generate_rewritten_transcript_with_overlap(
             if i > 0:
                 context = f"IMPORTANT: This is a continuation of a previous transcript. The last part was:\n{combined_transcript[-3:] if len(combined_transcript) >= 3 else combined_transcript}\nContinue the conversation seamlessly from here, maintaining the same style and tone."
             
-            if not is_final_chunk:
-                context += "\n\nIMPORTANT: DO NOT conclude the conversation or say goodbyes. This is the middle of the conversation, not the end."
-            else:
-                context += "\n\nThis is the final part of the conversation. You may conclude naturally if appropriate."
-            
-            # Be more explicit about the format required
-            format_instruction = """
-            CRITICALLY IMPORTANT: Your output MUST be in the exact format of a Python list of tuples, where each tuple contains a speaker name and their dialogue. 
-            Example format: [('Speaker1', 'This is what Speaker1 says.'), ('Speaker2', 'This is Speaker2's response.')]
-            Ensure all quotes are properly escaped and the entire response must be valid Python syntax that can be parsed by literal_eval().
-            """
-            
-            # Customize system prompt based on chunk position
-            if system_prompt == None:
-                chunk_system_prompt = map_step3_system_prompt(format_type=format_type, language=language) + "\n" + format_instruction
-            else:
-                chunk_system_prompt = system_prompt + "\n" + format_instruction
-                
-            if not is_final_chunk:
-                chunk_system_prompt += "\n\nIMPORTANT: Since this is not the final part of the conversation, DO NOT include any goodbyes, conclusions, or wrap-ups. The conversation should continue naturally."
+            context += position_context(is_final_chunk)
             
             conversation = [
-                {"role": "system", "content": chunk_system_prompt},
+                {"role": "system", "content": chunk_system_prompt(system_prompt, format_type, language, is_final_chunk)},
                 {"role": "user", "content": f"{chunk}\n\n{context}"},
             ]
             
             # Get response from model
-            chunk_transcript = generate_text(
+            chunk_data = request_dialogue(
                 client=client,
-                model=model_name,
-                messages=conversation,
+                model_name=model_name,
+                conversation=conversation,
                 max_tokens=max_tokens,
                 temperature=temperature,
+                rate_limiter=rate_limiter,
+                usage=usage,
+                stats=dialogue_stats,
+                cache_prompt=True,
+                stream=stream,
+                format_instruction=TUPLE_FORMAT_INSTRUCTION
             )
             
-            # Clean up transcript for parsing
-            cleaned_transcript = chunk_transcript.strip()
-            logger.debug(f"Raw chunk {i+1} transcript (first 200 chars): {cleaned_transcript[:200]}...")
-            
-            # Try to parse the transcript
-            try:
-                # Clean up common issues with quotes and formatting
-                cleaned_transcript = cleaned_transcript.replace("'", "'").replace(""", "\"").replace(""", "\"")
-                cleaned_transcript = cleaned_transcript.replace('…', '...')
-                
-                # Try to parse the cleaned transcript
-                chunk_data = literal_eval(cleaned_transcript)
-                
-                # Filter out any goodbye-like messages in non-final chunks
-                if not is_final_chunk:
-                    filtered_chunk_data = []
-                    for speaker, text in chunk_data:
-                        goodbye_phrases = ["goodbye", "bye", "farewell", "until next time", "see you", 
-                                        "thanks for listening", "that's all", "wrapping up", 
-                                        "concluding", "end of", "final thoughts"]
-                        
-                        # Find if any goodbye phrase exists in the text
-                        found_phrase = None
-                        for phrase in goodbye_phrases:
-                            if phrase in text.lower():
-                                found_phrase = phrase
-                                break
-                        
-                        if not found_phrase:
-                            filtered_chunk_data.append((speaker, text))
-                        else:
-                            # Replace with a continuation prompt instead
-                            modified_text = text.lower().split(found_phrase)[0]
-                            filtered_chunk_data.append((speaker, modified_text + "let's continue our discussion."))
-                    
-                    chunk_data = filtered_chunk_data
-                
-                # For first chunk, add all entries
-                if i == 0:
-                    combined_transcript.extend(chunk_data)
-                # For subsequent chunks, skip some initial entries to avoid repetition
-                else:
-                    # Skip first 1-2 entries as they might overlap with previous chunk
-                    skip_count = min(2, len(chunk_data) // 10)  # Skip ~10% or at most 2 entries
-                    combined_transcript.extend(chunk_data[skip_count:])
+            # Filter out any goodbye-like messages in non-final chunks
+            if not is_final_chunk:
+                chunk_data = filter_goodbyes(chunk_data)
             
-            except Exception as e:
-                # If parsing fails, try to fix the format with the model
-                logger.warning(f"Failed to parse chunk {i+1}: {str(e)}. Attempting to fix format...")
-                
-                fix_prompt = [
-                    {"role": "system", "content": "Convert the following text into valid Python syntax as a list of tuples with format: [('Speaker1', 'Text1'), ('Speaker2', 'Text2'), ...]. Make sure it's valid for literal_eval()."},
-                    {"role": "user", "content": chunk_transcript}
-                ]
-                
-                try:
-                    fixed_transcript = generate_text(
-                        client=client,
-                        model=model_name,
-                        messages=fix_prompt,
-                        max_tokens=max_tokens,
-                        temperature=0.3,
-                    )
-                    
-                    # Try to parse the fixed transcript
-                    chunk_data = literal_eval(fixed_transcript.strip())
-                    
-                    # Add to combined transcript
-                    if i == 0:
-                        combined_transcript.extend(chunk_data)
-                    else:
-                        skip_count = min(2, len(chunk_data) // 10)
-                        combined_transcript.extend(chunk_data[skip_count:])
-                        
-                    logger.info(f"Successfully fixed and parsed chunk {i+1}")
-                    
-                except Exception as retry_e:
-                    # If all attempts fail, raise a detailed error
-                    error_msg = f"Failed to parse chunk {i+1} after correction attempt: {str(retry_e)}"
-                    logger.error(error_msg)
-                    logger.error(f"Raw output (first 300 chars): {chunk_transcript[:300]}...")
-                    raise TranscriptGenerationError(error_msg)
+            kept = stitch_dialogue(combined_transcript, chunk_data, stitch_stats)
+            combined_transcript.extend(kept)
+            if transcript_writer is not None:
+                transcript_writer.extend(kept, chunk=i)
         
-        # Convert back to string representation
-        return str(combined_transcript)
+        return combined_transcript
 
     except Exception as e:
         raise TranscriptGenerationError(f"Failed to generate transcript with overlap: {str(e)}")
 
-def validate_transcript_format(transcript: str) -> bool:
+def handoff_summary(
+    client,
+    model_name,
+    chunk,
+    format_type,
+    max_tokens,
+    temperature,
+    rate_limiter: Optional[RateLimiter] = None,
+    usage: Optional[TokenUsage] = None,
+    max_words=80
+) -> str:
+    """Describe where the conversation stands at the end of an input chunk, for the chunk after it."""
+    conversation = [
+        {"role": "system", "content": step3_handoff_prompt.format(format_type=format_type, max_words=max_words)},
+        {"role": "user", "content": chunk},
+    ]
+    return generate_text(
+        client=client,
+        model=model_name,
+        messages=conversation,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        rate_limiter=rate_limiter,
+        cache_prompt=True,
+        usage=usage,
+    ).strip()
+
+def reconcile_seam(
+    client,
+    model_name,
+    turns,
+    format_type,
+    language,
+    max_tokens,
+    temperature,
+    rate_limiter: Optional[RateLimiter] = None,
+    usage: Optional[TokenUsage] = None,
+    dialogue_stats: Optional[DialogueStats] = None
+) -> List[Tuple[str, str]]:
+    """Smooth the turns on both sides of a chunk seam; the original turns are kept if this fails."""
+    conversation = [
+        {"role": "system", "content": step3_seam_prompt.format(format_type=format_type, language=language)},
+        {"role": "user", "content": "\n".join(f"{speaker}: {text}" for speaker, text in turns)},
+    ]
     try:
-        # Clean up the transcript string to handle escape sequences
-        cleaned_transcript = transcript.replace('\\(', '\\\\(').replace('\\)', '\\\\)')
-        data = literal_eval(cleaned_transcript)
-        if not isinstance(data, list):
-            return False
-        for item in data:
-            if not isinstance(item, tuple) or len(item) != 2:
-                return False
-            if not isinstance(item[0], str) or not isinstance(item[1], str):
-                return False
-        return True
-    except:
-        return False
+        reconciled = request_dialogue(
+            client=client,
+            model_name=model_name,
+            conversation=conversation,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            rate_limiter=rate_limiter,
+            usage=usage,
+            stats=dialogue_stats,
+            cache_prompt=True,
+            format_instruction=TUPLE_FORMAT_INSTRUCTION
+        )
+    except Exception as e:
+        if is_rate_limit_error(e):
+            raise
+        logger.warning(f"Seam reconciliation failed, keeping the turns as written: {str(e)}")
+        return list(turns)
+    return reconciled or list(turns)
+
+def generate_rewritten_transcript_parallel(
+    client,
+    model_name,
+    input_text,
+    max_tokens,
+    temperature,
+    format_type,
+    system_prompt,
+    language,
+    chunk_token_limit=2000,
+    overlap_turns=0,
+    count_tokens=estimate_tokens,
+    concurrency=4,
+    handoff_max_tokens=256,
+    seam_turns=2,
+    rate_limiter: Optional[RateLimiter] = None,
+    usage: Optional[TokenUsage] = None,
+    stitch_stats: Optional[StitchStats] = None,
+    dialogue_stats: Optional[DialogueStats] = None,
+    stream: bool = False,
+    transcript_writer: Optional[TranscriptWriter] = None
+) -> List[Tuple[str, str]]:
+    """Rewrite all chunks at once, then reconcile the turns at each seam.
+
+    Instead of the previous chunk's output, each chunk gets a short hand-off
+    summary of the input chunk before it. The summaries, the chunk rewrites and
+    the seam reconciliations each run in parallel. Duplicates at a seam are
+    removed with `stitch_dialogue`; then the last `seam_turns` turns before it and
+    the first `seam_turns` after it are rewritten together in one small call.
+    Reconciled turns are tagged with the chunk after the seam when written to
+    `transcript_writer`.
+    """
+    try:
+        chunks = split_by_turns(input_text, chunk_token_limit, overlap_turns, count_tokens)
+        logger.info(f"Processing transcript in {len(chunks)} chunks with {overlap_turns} overlapping turns and concurrency {concurrency}")
+
+        def run_parallel(fn, items, desc):
+            with ThreadPoolExecutor(max_workers=max(1, int(concurrency))) as executor:
+                return list(tqdm(executor.map(fn, items), total=len(items), desc=desc))
+
+        handoffs = run_parallel(
+            lambda chunk: handoff_summary(
+                client=client,
+                model_name=model_name,
+                chunk=chunk,
+                format_type=format_type,
+                max_tokens=handoff_max_tokens,
+                temperature=temperature,
+                rate_limiter=rate_limiter,
+                usage=usage,
+            ),
+            chunks[:-1],
+            "Summarizing chunk boundaries"
+        )
+
+        def rewrite(i):
+            is_final_chunk = (i == len(chunks) - 1)
+            context = ""
+            if i > 0:
+                context = f"IMPORTANT: This is a continuation of a previous transcript. Where the previous part left off:\n{handoffs[i - 1]}\nContinue the conversation seamlessly from there, without greeting the listeners or re-introducing the topic."
+            context += position_context(is_final_chunk)
+            conversation = [
+                {"role": "system", "content": chunk_system_prompt(system_prompt, format_type, language, is_final_chunk)},
+                {"role": "user", "content": f"{chunks[i]}\n\n{context}"},
+            ]
+            chunk_data = request_dialogue(
+                client=client,
+                model_name=model_name,
+                conversation=conversation,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                rate_limiter=rate_limiter,
+                usage=usage,
+                stats=dialogue_stats,
+                cache_prompt=True,
+                stream=stream,
+                format_instruction=TUPLE_FORMAT_INSTRUCTION
+            )
+            return chunk_data if is_final_chunk else filter_goodbyes(chunk_data)
+
+        parts = run_parallel(rewrite, range(len(chunks)), "Processing transcript chunks")
+
+        for i in range(1, len(parts)):
+            parts[i] = stitch_dialogue(parts[i - 1], parts[i], stitch_stats)
+
+        # Each seam takes turns from the end of one part and the start of the next, never more than half of a part,
+        # so that seams do not share turns and can be reconciled independently.
+        heads = [0] + [min(seam_turns, len(part) // 2) for part in parts[1:]]
+        tails = [min(seam_turns, len(part) - head) for part, head in zip(parts[:-1], heads)] + [0]
+        seams = [parts[i][len(parts[i]) - tails[i]:] + parts[i + 1][:heads[i + 1]] for i in range(len(parts) - 1)]
+        reconciled = run_parallel(
+            lambda turns: reconcile_seam(
+                client=client,
+                model_name=model_name,
+                turns=turns,
+                format_type=format_type,
+                language=language,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                rate_limiter=rate_limiter,
+                usage=usage,
+                dialogue_stats=dialogue_stats
+            ) if turns else [],
+            seams,
+            "Reconciling chunk seams"
+        )
+
+        combined_transcript = []
+        for i, part in enumerate(parts):
+            kept = (reconciled[i - 1] if i > 0 else []) + part[heads[i]:len(part) - tails[i]]
+            combined_transcript.extend(kept)
+            if transcript_writer is not None:
+                transcript_writer.extend(kept, chunk=i)
+
+        return combined_transcript
+
+    except Exception as e:
+        raise TranscriptGenerationError(f"Failed to generate transcript in parallel: {str(e)}")
 
 def step3(
     client = None,
@@ -251,91 +820,126 @@ def step3(
     format_type: FormatType = "podcast",
     system_prompt: str = None,
     language: str = "english"
-) -> str:
+) -> Tuple[str, str, Transcript]:
+    """Rewrite the step2 transcript into TTS-ready turns.
+
+    Returns the input file, the output path without extension, and the turns as a
+    `Transcript` for passing to step4 without re-reading the file.
+    """
     try:
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        input_path = input_file
-        if not input_file.endswith('.pkl'):
-            input_path = f"{input_path}.pkl"
-
         # Read input file
         logger.info(f"Reading input file: {input_file}")
-        input_text = read_pickle_file(input_file)
+        input_text = read_transcript_file(input_file)
 
         logger.info(f"Optimizing transcript for TTS...")
 
-        # Check if we need to generate in chunks with overlap
-        if len(input_text) > config["Step3"].get("chunk_size", 8000):
-            logger.info("Input text is large, generating transcript in chunks with overlap...")
-            transcript = generate_rewritten_transcript_with_overlap(
-                client=client,
-                model_name=config["Big-Text-Model"]["model"],
-                input_text=input_text,
-                format_type=format_type,
-                system_prompt=system_prompt,
-                max_tokens=config["Step3"]["max_tokens"],
-                temperature=config["Step1"]["temperature"],
-                chunk_size=config["Step3"].get("chunk_size", 8000),
-                overlap_percent=config["Step3"].get("overlap_percent", 10),
-                language=language
-            )
+        count_tokens = token_counter_for(config["Big-Text-Model"])
+        chunk_token_limit = config["Step3"].get("chunk_token_limit", 2000)
+        rate_limiter = get_rate_limiter(config["Big-Text-Model"]["provider"])
+        usage = TokenUsage()
+        stitch_stats = StitchStats()
+        dialogue_stats = DialogueStats(structured=config["Step3"].get("structured_output", True))
+        stream = config["Step3"].get("stream", True)
+
+        # Turns are written as they are produced, so step4 or the API can follow the file,
+        # and collected in a Transcript that can be handed to step4 directly.
+        output_file = output_dir / 'podcast_ready_data'
+        header = {"step": "step3", "format_type": format_type, "language": language}
+        transcript = Transcript(**header)
+        writer = TranscriptWriter(f'{output_file}.jsonl', transcript=transcript, **header)
+
+        fast_turns = None
+        if config["Step3"].get("fast_path", True) and system_prompt is None:
+            fast_turns, reason = convert_transcript(input_text, format_type, language)
+            if fast_turns is None:
+                logger.info(f"Transcript needs the model rewrite: {reason}")
+
+        # Check if we need to generate in chunks
+        if fast_turns is not None:
+            logger.info(f"Transcript is already TTS-ready, converted {len(fast_turns)} turns without the model")
+            with writer:
+                writer.extend(fast_turns)
+            turns = fast_turns
+        elif count_tokens(input_text) > chunk_token_limit:
+            logger.info("Input text is large, generating transcript in chunks...")
+            with writer:
+                if config["Step3"].get("mode", "sequential") == "parallel":
+                    turns = generate_rewritten_transcript_parallel(
+                        client=client,
+                        model_name=config["Big-Text-Model"]["model"],
+                        input_text=input_text,
+                        format_type=format_type,
+                        system_prompt=system_prompt,
+                        max_tokens=config["Step3"]["max_tokens"],
+                        temperature=config["Step1"]["temperature"],
+                        chunk_token_limit=chunk_token_limit,
+                        overlap_turns=config["Step3"].get("overlap_turns", 0),
+                        count_tokens=count_tokens,
+                        concurrency=config["Step3"].get("concurrency", 4),
+                        language=language,
+                        rate_limiter=rate_limiter,
+                        usage=usage,
+                        stitch_stats=stitch_stats,
+                        dialogue_stats=dialogue_stats,
+                        stream=stream,
+                        transcript_writer=writer
+                    )
+                else:
+                    turns = generate_rewritten_transcript_with_overlap(
+                        client=client,
+                        model_name=config["Big-Text-Model"]["model"],
+                        input_text=input_text,
+                        format_type=format_type,
+                        system_prompt=system_prompt,
+                        max_tokens=config["Step3"]["max_tokens"],
+                        temperature=config["Step1"]["temperature"],
+                        chunk_token_limit=chunk_token_limit,
+                        overlap_turns=config["Step3"].get("overlap_turns", 0),
+                        count_tokens=count_tokens,
+                        language=language,
+                        rate_limiter=rate_limiter,
+                        usage=usage,
+                        stitch_stats=stitch_stats,
+                        dialogue_stats=dialogue_stats,
+                        stream=stream,
+                        transcript_writer=writer
+                    )
         else:
             # Generate rewritten transcript in one go
             logger.info(f"Generating rewritten transcript...")
-            transcript = generate_rewritten_transcript(
-                client=client,
-                system_prompt=system_prompt,
-                model_name=config["Big-Text-Model"]["model"],
-                input_text=input_text,
-                format_type=format_type,
-                max_tokens=config["Step3"]["max_tokens"],
-                temperature=config["Step1"]["temperature"],
-                language=language
-            )
-
-        if not validate_transcript_format(transcript):
-            logger.warning("Generated transcript is not in the correct format. Attempting to fix...")
-            
-            fix_prompt = [
-                {"role": "system", "content": "Convert the following text into valid Python syntax as a list of tuples with format: [('Speaker1', 'Text1'), ('Speaker2', 'Text2'), ...]. Return ONLY the Python list, nothing else, no other text."},
-                {"role": "user", "content": transcript}
-            ]
-            
-            try:
-                fixed_transcript = generate_text(
+            with writer:
+                turns = generate_rewritten_transcript(
                     client=client,
-                    model=config["Big-Text-Model"]["model"],
-                    messages=fix_prompt,
+                    system_prompt=system_prompt,
+                    model_name=config["Big-Text-Model"]["model"],
+                    input_text=input_text,
+                    format_type=format_type,
                     max_tokens=config["Step3"]["max_tokens"],
-                    temperature=0.3,
+                    temperature=config["Step1"]["temperature"],
+                    language=language,
+                    rate_limiter=rate_limiter,
+                    usage=usage,
+                    dialogue_stats=dialogue_stats,
+                    stream=stream,
+                    transcript_writer=writer
                 )
-                
-                # Try to validate the fixed transcript
-                if validate_transcript_format(fixed_transcript.strip()):
-                    logger.info("Successfully fixed transcript format")
-                    transcript = fixed_transcript.strip()
-                else:
-                    raise TranscriptGenerationError("Generated transcript is not in the correct format after correction attempt")
-                    
-            except Exception as retry_e:
-                # If the fix attempt fails, raise a detailed error
-                error_msg = f"Failed to fix transcript format: {str(retry_e)}"
-                logger.error(error_msg)
-                logger.error(f"Raw output (first 300 chars): {transcript[:300]}...")
-                raise TranscriptGenerationError(error_msg)
-
-        # Save transcript
-        output_file = output_dir / 'podcast_ready_data'
-        with open(f'{output_file}.pkl', 'wb') as file:
-            pickle.dump(transcript, file)
+
+        logger.info(f"Dialogue parsing: {dialogue_stats.as_dict()}")
+
+        if stitch_stats.seams:
+            logger.info(f"Removed {stitch_stats.duplicate_chars} duplicate characters ({stitch_stats.duplicate_turns} turns) at {stitch_stats.seams} chunk seams")
+
+        if usage.prompt_tokens:
+            logger.info(f"Prompt cache: {usage.cached_tokens} of {usage.prompt_tokens} prompt tokens served from cache over {usage.calls} calls")
 
         with open(f'{output_file}.txt', 'w') as file:
-            file.write(transcript)
+            file.write(str(turns))
 
-        logger.info(f"Rewritten transcript saved to: {output_file}")
-        return str(input_file), str(output_file)
+        logger.info(f"Rewritten transcript saved to: {output_file}.jsonl ({len(turns)} turns)")
+        return str(input_file), str(output_file), transcript
 
     except (FileReadError, TranscriptGenerationError, InvalidParameterError) as e:
         logger.error(f"Transcript rewriting failed: {str(e)}")
@@ -1,6 +1,7 @@
-from .helpers import wait_for_next_step, generate_speech
-from typing import List, Tuple, Dict, Any, Optional
-import logging, pickle, ast, re
+from .helpers import generate_speech, get_rate_limiter, RateLimiter
+from .transcript import Transcript, TranscriptFormatError, iter_transcript
+from typing import Iterator, Tuple, Dict, Any, Optional
+import logging, re
 from pathlib import Path
 import soundfile as sf
 from tqdm import tqdm
@@ -12,14 +13,14 @@ logger = logging.getLogger(__name__)
 class AudioGenerationError(Exception):
     pass
 
-def load_podcast_data(data_path: Path) -> List[Tuple[str, str]]:
+def load_podcast_data(data_path: Path) -> Iterator[Tuple[str, str]]:
+    """Yield (speaker, text) turns from the step3 transcript as they are read."""
     try:
-        with open(data_path, 'rb') as file:
-            podcast_text = pickle.load(file)
-        return ast.literal_eval(podcast_text)
+        for turn in iter_transcript(data_path):
+            yield turn["speaker"], turn["text"]
     except FileNotFoundError:
         raise FileNotFoundError(f"Podcast data file not found: {data_path}")
-    except (ValueError, SyntaxError) as e:
+    except (TranscriptFormatError, ValueError) as e:
         raise ValueError(f"Invalid podcast data format: {str(e)}")
 
 def concatenate_audio_files(segment_dir: Path, format: str = "wav") -> Tuple[np.ndarray, int]:
@@ -52,17 +53,18 @@ def generate_speaker_audio(
     text,
     output_path,
     voice,
-    response_format
+    response_format,
+    rate_limiter: Optional[RateLimiter] = None
 ) -> None:
     try:
-        wait_for_next_step()
         generate_speech(
             client=client,
             model_name=model_name,
             text=text,
             output_path=output_path,
             voice=voice,
-            response_format=response_format
+            response_format=response_format,
+            rate_limiter=rate_limiter
         )
         # Validate that the audio file was created
         output_file = output_path.with_suffix(f".{response_format}")
@@ -92,8 +94,14 @@ def step4(
     client: Any = None,
     config: Optional[Dict[str, Any]] = None,
     input_dir: str = None,
-    output_dir: str = None
+    output_dir: str = None,
+    transcript: Optional[Transcript] = None
 ) -> Path:
+    """Synthesize every turn and concatenate the segments into the final audio file.
+
+    Turns come from `transcript` when given (for example straight from step3),
+    otherwise they are read from `podcast_ready_data.jsonl` in `input_dir`.
+    """
     model_name = config["Text-To-Speech-Model"]["model"]
     host = config["Host-Speaker-Voice"]
     co_host_1 = config["Co-Host-Speaker-1-Voice"]
@@ -101,6 +109,7 @@ def step4(
     co_host_3 = config["Co-Host-Speaker-3-Voice"]
     co_host_4 = config["Co-Host-Speaker-4-Voice"]
     response_format = config["Text-To-Speech-Model"].get("audio_format", "wav")
+    rate_limiter = get_rate_limiter(config["Text-To-Speech-Model"]["provider"])
     
     try:
         input_dir = Path(input_dir)
@@ -116,10 +125,15 @@ def step4(
         segments_dir.mkdir(parents=True, exist_ok=True)
         
         # Load podcast data
-        podcast_data = load_podcast_data(input_dir / "podcast_ready_data.pkl")
+        if transcript is not None:
+            podcast_data = transcript.pairs()
+            total = len(transcript)
+        else:
+            podcast_data = load_podcast_data(input_dir / "podcast_ready_data.jsonl")
+            total = None
         
         # Generate audio segments
-        for i, (speaker, text) in enumerate(tqdm(podcast_data, desc="Generating podcast segments"), 1):
+        for i, (speaker, text) in enumerate(tqdm(podcast_data, total=total, desc="Generating podcast segments"), 1):
             output_path = segments_dir / f"podcast_segment_{i}"
 
             if speaker == "Speaker 1":
@@ -139,7 +153,8 @@ def step4(
                 model_name=model_name,
                 output_path=output_path,
                 voice=current_voice,
-                response_format=response_format
+                response_format=response_format,
+                rate_limiter=rate_limiter
             )
         
         # Concatenate all segments
@@ -0,0 +1,117 @@
+from .helpers import Counters
+from typing import Any, Callable, List, Optional, Sequence
+import re
+
+
+SHINGLE_WORDS = 4
+SENTENCE_BREAK = re.compile(r'(?<=[.!?…])\s+')
+SPEAKER_LABEL = re.compile(r'^(\s*[^\W\d_][\w .\'-]{0,40}:\s*)')
+WORD = re.compile(r"\w+")
+
+class StitchStats(Counters):
+    """Thread-safe counters for duplicate content removed at chunk seams."""
+
+    FIELDS = ("seams", "duplicate_chars", "duplicate_turns")
+
+def _shingles(text: str) -> List[int]:
+    """Hashes of every run of `SHINGLE_WORDS` normalized words, or of the whole text if it is shorter."""
+    words = WORD.findall(text.lower())
+    if not words:
+        return []
+    if len(words) < SHINGLE_WORDS:
+        return [hash(tuple(words))]
+    return [hash(tuple(words[i:i + SHINGLE_WORDS])) for i in range(len(words) - SHINGLE_WORDS + 1)]
+
+def _coverage(text: str, seen: set) -> float:
+    shingles = _shingles(text)
+    if not shingles:
+        return 1.0
+    return sum(1 for shingle in shingles if shingle in seen) / len(shingles)
+
+def _words(text: str) -> List[str]:
+    return WORD.findall(text.lower())
+
+def stitch_turns(
+    previous: Sequence[Any],
+    following: Sequence[Any],
+    text_of: Callable[[Any], str] = lambda turn: turn,
+    with_text: Callable[[Any, str], Any] = lambda turn, text: text,
+    window_turns: int = 12,
+    threshold: float = 0.6,
+    stats: Optional[StitchStats] = None
+) -> List[Any]:
+    """Return `following` without the leading turns that repeat the end of `previous`.
+
+    Consecutive chunk outputs overlap because their inputs overlap. Only a leading
+    run of `following` that lines up with a run at the very end of `previous` (within
+    the last `window_turns` turns) is dropped. In that run, a turn of at least
+    `SHINGLE_WORDS` words matches if `threshold` of its word shingles appear in the
+    aligned run of `previous`. A shorter turn, such as "Exactly.", matches only if
+    it is identical to the turn it aligns with. A run made only of short turns is
+    never dropped. In the first turn that is kept, leading sentences repeating the
+    last turn of `previous` are trimmed, so the seam is cut at a sentence rather
+    than a whole turn.
+    """
+    following = list(following)
+    if not previous or not following:
+        return following
+
+    tail = [text_of(turn) for turn in previous[-window_turns:]]
+    tail_shingles = [set(_shingles(text)) for text in tail]
+
+    def run_matches(length: int) -> bool:
+        aligned = tail[len(tail) - length:]
+        seen = set().union(*tail_shingles[len(tail) - length:])
+        has_long_turn = False
+        for turn, previous_text in zip(following, aligned):
+            words = _words(text_of(turn))
+            if len(words) < SHINGLE_WORDS:
+                if words != _words(previous_text):
+                    return False
+            elif _coverage(text_of(turn), seen) >= threshold:
+                has_long_turn = True
+            else:
+                return False
+        return has_long_turn
+
+    duplicates = next((length for length in range(min(len(tail), len(following)), 0, -1) if run_matches(length)), 0)
+    removed_chars = sum(len(text_of(turn)) for turn in following[:duplicates] if text_of(turn).strip())
+    removed_turns = sum(1 for turn in following[:duplicates] if text_of(turn).strip())
+    following = following[duplicates:]
+
+    if following:
+        sentences = SENTENCE_BREAK.split(text_of(following[0]).strip())
+        dropped = 0
+        # Single-sentence turns are left whole, and short sentences are never dropped on coverage alone.
+        while (
+            dropped < len(sentences) - 1
+            and len(_words(sentences[dropped])) >= SHINGLE_WORDS
+            and _coverage(sentences[dropped], tail_shingles[-1]) >= threshold
+        ):
+            removed_chars += len(sentences[dropped]) + 1
+            dropped += 1
+        if dropped:
+            following[0] = with_text(following[0], " ".join(sentences[dropped:]))
+
+    if stats is not None:
+        stats.add(seams=1, duplicate_chars=removed_chars, duplicate_turns=removed_turns)
+    return following
+
+def _line_text(line: str) -> str:
+    return SPEAKER_LABEL.sub("", line, count=1)
+
+def _line_with_text(line: str, text: str) -> str:
+    label = SPEAKER_LABEL.match(line)
+    return (label.group(1) if label else "") + text
+
+def stitch_text(previous: str, following: str, stats: Optional[StitchStats] = None, **kwargs: Any) -> str:
+    """Line-based `stitch_turns` for plain transcripts; `Speaker N:` labels are kept on trimmed lines."""
+    kept = stitch_turns(
+        [line for line in previous.splitlines() if line.strip()],
+        [line for line in following.splitlines() if line.strip()],
+        text_of=_line_text,
+        with_text=_line_with_text,
+        stats=stats,
+        **kwargs
+    )
+    return "\n".join(kept)
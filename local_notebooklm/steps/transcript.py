@@ -0,0 +1,185 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from pathlib import Path
+import json, re, sys
+
+
+TRANSCRIPT_FORMAT = "local-notebooklm-transcript"
+TRANSCRIPT_VERSION = 1
+SPEAKER_LINE = re.compile(r'^\s*([^\W\d_][\w .\'-]{0,40}?)\s*:\s*(.*)$')
+
+class TranscriptFormatError(Exception):
+    pass
+
+class Turn:
+    """One transcript turn: an interned speaker id, the text, and the index of its source chunk (or None)."""
+
+    __slots__ = ("speaker_id", "text", "chunk")
+
+    def __init__(self, speaker_id: int, text: str, chunk: Optional[int] = None):
+        self.speaker_id = speaker_id
+        self.text = text
+        self.chunk = chunk
+
+    def __repr__(self):
+        return f"Turn(speaker_id={self.speaker_id!r}, text={self.text!r}, chunk={self.chunk!r})"
+
+class Transcript:
+    """In-memory transcript passed between stages running in the same process.
+
+    Speakers are stored once in `speakers` and referenced by index from each
+    `Turn`, so long transcripts hold one small object per turn. `meta` carries
+    the same fields as a transcript file header.
+    """
+
+    __slots__ = ("speakers", "turns", "meta", "_speaker_ids")
+
+    def __init__(self, **meta: Any):
+        self.speakers: List[Optional[str]] = []
+        self.turns: List[Turn] = []
+        self.meta = meta
+        self._speaker_ids: Dict[Optional[str], int] = {}
+
+    def speaker_id(self, speaker: Optional[str]) -> int:
+        speaker_id = self._speaker_ids.get(speaker)
+        if speaker_id is None:
+            speaker_id = len(self.speakers)
+            self.speakers.append(sys.intern(speaker) if speaker is not None else None)
+            self._speaker_ids[speaker] = speaker_id
+        return speaker_id
+
+    def append(self, speaker: Optional[str], text: str, chunk: Optional[int] = None):
+        self.turns.append(Turn(self.speaker_id(speaker), text, chunk))
+
+    def extend(self, turns: Iterable[Tuple[Optional[str], str]], chunk: Optional[int] = None):
+        for speaker, text in turns:
+            self.append(speaker, text, chunk)
+
+    def speaker(self, turn: Turn) -> Optional[str]:
+        return self.speakers[turn.speaker_id]
+
+    def pairs(self) -> Iterator[Tuple[Optional[str], str]]:
+        """Yield (speaker, text) for every turn."""
+        for turn in self.turns:
+            yield self.speakers[turn.speaker_id], turn.text
+
+    def __len__(self):
+        return len(self.turns)
+
+    def __iter__(self) -> Iterator[Turn]:
+        return iter(self.turns)
+
+    @classmethod
+    def read(cls, path: str) -> "Transcript":
+        """Load a JSON Lines transcript file; header fields other than format and version become `meta`."""
+        transcript = cls()
+        for record in iter_transcript(path, meta=transcript.meta):
+            transcript.append(record["speaker"], record["text"], record.get("chunk"))
+        return transcript
+
+class TranscriptWriter:
+    """Appends turns to a JSON Lines transcript, one turn per line, flushed as they are written.
+
+    The first line is a header naming the format and version. Every other line
+    holds `turn` (0-based index), `speaker`, `text` and `chunk` (the index of the
+    source chunk, or None). Readers can follow the file while it is being written.
+    If `transcript` is given, every turn written is also added to it.
+    """
+
+    def __init__(self, path: str, transcript: Optional[Transcript] = None, **header: Any):
+        self.path = Path(path)
+        self.turns = 0
+        self.transcript = transcript
+        self._offsets = []
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write({"format": TRANSCRIPT_FORMAT, "version": TRANSCRIPT_VERSION, **header})
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def append(self, speaker: Optional[str], text: str, chunk: Optional[int] = None):
+        self._offsets.append(self._file.tell())
+        self._write({"turn": self.turns, "speaker": speaker, "text": text, "chunk": chunk})
+        self.turns += 1
+        if self.transcript is not None:
+            self.transcript.append(speaker, text, chunk)
+
+    def extend(self, turns: Iterable[Tuple[Optional[str], str]], chunk: Optional[int] = None):
+        for speaker, text in turns:
+            self.append(speaker, text, chunk)
+
+    def append_text(self, text: str, chunk: Optional[int] = None):
+        """Append free-form transcript text as one turn per non-empty line, splitting off `Speaker:` labels."""
+        self.extend(split_speaker_lines(text), chunk)
+
+    def truncate(self, turns: int):
+        """Drop every turn after the first `turns`, e.g. when streamed turns turn out to be wrong.
+
+        Readers following the file may already have seen the dropped turns.
+        """
+        if turns >= self.turns:
+            return
+        self._file.seek(self._offsets[turns])
+        self._file.truncate()
+        self._file.flush()
+        del self._offsets[turns:]
+        self.turns = turns
+        if self.transcript is not None:
+            del self.transcript.turns[turns:]
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def split_speaker_lines(text: str) -> List[Tuple[Optional[str], str]]:
+    turns = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        match = SPEAKER_LINE.match(line)
+        if match and match.group(2).strip():
+            turns.append((match.group(1), match.group(2).strip()))
+        else:
+            turns.append((None, line.strip()))
+    return turns
+
+def iter_transcript(path: str, meta: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield turn records from a JSON Lines transcript one at a time.
+
+    A trailing line that is still being written is skipped, so a transcript can be
+    read while another stage appends to it. If `meta` is given, it is updated
+    with the file's header fields other than format and version.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        header = file.readline()
+        if not header.endswith("\n"):
+            return
+        try:
+            header = json.loads(header)
+        except json.JSONDecodeError:
+            raise TranscriptFormatError(f"'{path}' is not a transcript file")
+        if header.get("format") != TRANSCRIPT_FORMAT:
+            raise TranscriptFormatError(f"'{path}' is not a transcript file")
+        if header.get("version", 0) > TRANSCRIPT_VERSION:
+            raise TranscriptFormatError(f"'{path}' uses transcript version {header['version']}, newer than supported version {TRANSCRIPT_VERSION}")
+        if meta is not None:
+            meta.update({key: value for key, value in header.items() if key not in ("format", "version")})
+        for line in file:
+            if not line.endswith("\n"):
+                break
+            yield json.loads(line)
+
+def read_transcript_turns(path: str) -> List[Tuple[Optional[str], str]]:
+    return [(turn["speaker"], turn["text"]) for turn in iter_transcript(path)]
+
+def read_transcript_text(path: str) -> str:
+    """Render a transcript back to `Speaker: text` lines."""
+    return "\n".join(
+        f"{turn['speaker']}: {turn['text']}" if turn["speaker"] else turn["text"]
+        for turn in iter_transcript(path)
+    )